@@ -0,0 +1,101 @@
+"""
+自适应阈值：按实测的盘口推送间隔和下单确认耗时，推导
+  - quote_age    挂单前允许的最大盘口年龄（原来写死 0.3s）
+  - cancel_age   挂单期间盘口超过这个年龄就撤单（原来写死 0.6s）
+  - ack_timeout  create_order 的 read timeout（原来写死 1s）
+每个阈值 = clamp(分位数 * 倍数, 下限, 上限)，上限不超过原来的固定值：链路快时阈值收紧，
+链路变慢时最多回到原来的固定值，不会比自适应之前更宽松。样本不足时用原来的固定值。
+"""
+import time
+import logging
+from collections import namedtuple
+
+import metrics
+import st_http
+from latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+Thresholds = namedtuple("Thresholds", ["quote_age", "cancel_age", "ack_timeout"])
+
+DEFAULT_THRESHOLDS = Thresholds(quote_age=0.3, cancel_age=0.6, ack_timeout=1.0)
+
+# name -> (数据源, 分位数, 倍数, 下限, 上限)；上限另外还会被压到 DEFAULT_THRESHOLDS 以内
+DEFAULT_RULES = {
+    "quote_age": ("feed_gap", 0.99, 3.0, 0.15, 0.3),
+    "cancel_age": ("feed_gap", 0.99, 6.0, 0.3, 0.6),
+    "ack_timeout": ("ack", 0.99, 3.0, 0.5, 1.0),
+}
+
+THRESHOLD = metrics.gauge("beggar_adaptive_threshold_seconds", "Current adaptive thresholds", ("name",))
+OBSERVED = metrics.gauge("beggar_adaptive_observed_seconds", "Observed latency percentiles behind the adaptive thresholds", ("source", "quantile"))
+
+
+class AdaptiveController:
+    def __init__(self, rules=None, interval=5, min_samples=50, change_ratio=0.1):
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        self.interval = interval
+        self.min_samples = min_samples
+        self.change_ratio = change_ratio
+        self.sources = {
+            "feed_gap": LatencyTracker(1024),
+            "ack": st_http.latency_tracker(st_http.NEW_ORDER_PATH),
+        }
+        self.thresholds = DEFAULT_THRESHOLDS
+        self._last_frame = None
+        self._next_update = 0.0
+        for name, value in self.thresholds._asdict().items():
+            THRESHOLD.labels(name=name).set(value)
+        for source, tracker in self.sources.items():
+            for q in (0.5, 0.99):
+                OBSERVED.labels(source=source, quantile=q).set_function(lambda t=tracker, q=q: _or_nan(t.percentile(q)))
+
+    def on_frame(self, now=None):
+        """每个盘口帧调用一次（WS 解码线程），记录推送间隔。"""
+        now = time.monotonic() if now is None else now
+        if self._last_frame is not None:
+            self.sources["feed_gap"].record(now - self._last_frame)
+        self._last_frame = now
+
+    def update(self, now=None):
+        """策略线程每轮调用；最多每 interval 秒重算一次，返回当前 Thresholds。"""
+        now = time.monotonic() if now is None else now
+        if now < self._next_update:
+            return self.thresholds
+        self._next_update = now + self.interval
+        old = self.thresholds
+        values = {}
+        for name, (source, q, mult, lo, hi) in self.rules.items():
+            tracker = self.sources[source]
+            if len(tracker) < self.min_samples:
+                values[name] = getattr(old, name)
+                continue
+            hi = min(hi, getattr(DEFAULT_THRESHOLDS, name))
+            values[name] = min(hi, max(lo, tracker.percentile(q) * mult))
+        new = Thresholds(**values)
+        changed = {
+            name: (round(getattr(old, name), 3), round(getattr(new, name), 3))
+            for name in Thresholds._fields
+            if abs(getattr(new, name) - getattr(old, name)) > getattr(old, name) * self.change_ratio
+        }
+        if not changed:
+            return old
+        self.thresholds = new
+        for name, value in new._asdict().items():
+            THRESHOLD.labels(name=name).set(value)
+        st_http.set_order_timeout(new.ack_timeout)
+        observed = {
+            source: f"p50={_fmt(t.percentile(0.5))} p99={_fmt(t.percentile(0.99))}"
+            for source, t in self.sources.items()
+        }
+        logger.info(f"adaptive thresholds changed: {changed}, observed: {observed}")
+        return new
+
+
+def _or_nan(v):
+    return float("nan") if v is None else v
+
+
+def _fmt(v):
+    return "n/a" if v is None else f"{v * 1000:.1f}ms"
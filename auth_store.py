@@ -0,0 +1,139 @@
+"""
+多账户 auth 存储：一个 JSON 文件，按账户名索引，记录 token 签发和过期时间。
+
+  {
+    "version": 1,
+    "accounts": {
+      "acct1": {"address": "0x...", "access_token": "...", "signing_key": "<hex>",
+                "issued_at": 1767225600, "expires_at": 1798761600}
+    }
+  }
+
+写入一律先写临时文件、fsync 再 os.replace，正在运行的 bot 读到的要么是旧文件要么是新文件。
+load_auth 同时兼容 gen_auth.py 原来的单账户文件（顶层直接是 access_token / signing_key）。
+"""
+import os
+import json
+import time
+import base64
+import threading
+import logging
+from nacl.signing import SigningKey
+
+logger = logging.getLogger(__name__)
+
+
+def token_expiry(token):
+    """从 JWT 的 exp 字段取过期时间（epoch 秒）；不是 JWT 或没有 exp 时返回 None。"""
+    try:
+        payload_b64 = token.split(".")[1]
+        payload_b64 += "=" * (-len(payload_b64) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload_b64)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+class AuthStore:
+    def __init__(self, path):
+        self.path = path
+        self.accounts = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.accounts = json.load(f).get("accounts", {})
+
+    def put(self, name, address, access_token, signing_key_hex, issued_at, expires_at):
+        with self._lock:
+            self.accounts[name] = {
+                "address": address,
+                "access_token": access_token,
+                "signing_key": signing_key_hex,
+                "issued_at": issued_at,
+                "expires_at": expires_at,
+            }
+
+    def due(self, ahead_seconds, now=None):
+        """需要轮换的账户名：ahead_seconds 内过期（或没有过期时间记录）。"""
+        now = time.time() if now is None else now
+        return [
+            name for name, entry in self.accounts.items()
+            if not entry.get("expires_at") or entry["expires_at"] - now <= ahead_seconds
+        ]
+
+    def save(self):
+        with self._lock:
+            data = {"version": 1, "accounts": self.accounts}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+
+
+def load_auth(path, account=None):
+    """返回 bot 使用的 auth dict（access_token + SigningKey；auth store 里记录了地址时带上 address）。"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "accounts" in data:
+        accounts = data["accounts"]
+        if account is None:
+            if len(accounts) != 1:
+                raise ValueError(f"{path} holds {len(accounts)} accounts, pick one with --account: {sorted(accounts)}")
+            account = next(iter(accounts))
+        if account not in accounts:
+            raise ValueError(f"account {account!r} not found in {path}")
+        data = accounts[account]
+    auth = {
+        'access_token': data['access_token'],
+        'signing_key': SigningKey(bytes.fromhex(data['signing_key'])),
+    }
+    if data.get('address'):
+        auth['address'] = data['address']
+    return auth
+
+
+def account_id(auth):
+    """账户标识，用于确认两个进程用的是同一个账户：有钱包地址时用地址，否则用签名公钥指纹。"""
+    if auth.get('address'):
+        return auth['address'].lower()
+    return "key:" + auth['signing_key'].verify_key.encode().hex()[:16]
+
+
+class AuthWatcher:
+    """
+    盯着 auth 文件的 mtime；refresher 轮换 token 后，poll() 在下一次检查时返回新的 auth dict，
+    由调用方在安全点原地 update 进正在使用的 auth，其他持有同一个 dict 的地方随之生效。
+    """
+
+    def __init__(self, path, account=None, interval=5):
+        self.path = path
+        self.account = account
+        self.interval = interval
+        self._mtime = self._stat()
+        self._next_check = time.monotonic() + interval
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return None
+        try:
+            auth = load_auth(self.path, self.account)
+        except Exception as e:
+            logger.info(f"auth reload from {self.path} failed, keeping current token: {e}")
+            return None
+        self._mtime = mtime
+        logger.info(f"auth reloaded from {self.path}")
+        return auth
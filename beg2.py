@@ -1,17 +1,31 @@
 
-import json
 import logging
 import time
-from nacl.signing import SigningKey
 from backoff import CancelBackoff
+from cooldown import Cooldown
+from profiler import SamplingProfiler, install_signal_handler
+import metrics
+import faults
+import gc_control
+import st_http
 import signal
 import argparse
-from st_ws import StandXBookWS, StandXPositionWS
-from st_http import cancel_orders
+from supervisor import Supervisor
 from zoneinfo import ZoneInfo
 from datetime import datetime
 from config import SKIP_HOUR_START, SKIP_HOUR_END
-from common import create_orders, clean_positions, clean_orders
+from params import Params, ParamStore, apply_backoff
+from control import ControlServer
+from common import create_orders, clean_positions, clean_orders, cancel_orders, set_journal, query_positions, use_gateway
+from gateway import GatewayClient
+from auth_store import load_auth, AuthWatcher
+from events import Event, EventQueue
+from journal import Journal
+from snapshot import SnapshotHolder
+from watchdog import Watchdog
+from ladder import build_ladder, ladder_depths, ladder_bps, ladder_in_range, bps_in_range
+from market_stats import MarketStats, quote_adjustment
+from adaptive import AdaptiveController, DEFAULT_THRESHOLDS
 
 
 from logconf import setup_logging
@@ -25,151 +39,304 @@ logger = logging.getLogger(__name__)
 def _on_term(signum, frame):
     global _should_exit
     _should_exit = True
+    cooldown.wake("exit")
 
 signal.signal(signal.SIGTERM, _on_term)
 signal.signal(signal.SIGINT, _on_term)
 
 
 
+LOOP_ITERATIONS = metrics.counter("beggar_loop_iterations_total", "Strategy loop iterations")
+BOOK_AGE = metrics.gauge("beggar_book_age_seconds", "Book age at the last decision")
+QUOTE_BPS = metrics.gauge("beggar_quote_bps", "Innermost quote distance from mark price in bps", ("side",))
+QUOTE_DEPTH = metrics.gauge("beggar_quote_depth", "Book depth in front of the innermost quote", ("side",))
+EVAL_SKIPPED = metrics.counter("beggar_eval_skipped_total", "Loop iterations that skipped re-evaluating an unchanged book")
+CANCELS = metrics.counter("beggar_cancels_total", "Ladder cancels by reason", ("reason",))
+REQUOTES = metrics.counter("beggar_requotes_total", "Ladder placements by the reason of the previous cancel", ("reason",))
+BACKOFF_PENALTY = metrics.gauge("beggar_backoff_penalty_seconds", "Current CancelBackoff penalty")
+QUOTE_SHIFT = metrics.gauge("beggar_quote_shift_bps", "Quote width adjustment from market stats")
+MARKET_VOL = metrics.gauge("beggar_market_vol_bps", "Rolling realized volatility", ("window",))
+MARKET_DRIFT = metrics.gauge("beggar_market_drift_bps", "Rolling mid-price drift", ("window",))
+MARKET_IMBALANCE = metrics.gauge("beggar_market_imbalance", "Rolling top-of-book imbalance", ("window",))
+MARKET_DEPTH_RATIO = metrics.gauge("beggar_market_depth_ratio", "Current depth / rolling average depth", ("window",))
+
 _should_exit = False
-st_book = None
-st_book_ts = 0
-st_position = None
-
-
-
-def main(position, auth):
-    backoff = CancelBackoff()
-    logger.info(f"Starting beggar with position size: {position}")
-    def set_book(b):
-        global st_book
-        global st_book_ts
-        st_book = b
-        st_book_ts = time.time()
-
-    def set_position(p):
-        global st_position
-        # if p :
-        #     if p['qty'] and float(p['qty']) != 0:
-        #         logger.info(f"position update: {p}")
-        st_position = p
-    
-    book_ws = StandXBookWS(set_book)
-    book_ws.start_in_thread()
-
-    pos_ws = StandXPositionWS(set_position, access_token=auth['access_token'])
-    pos_ws.start_in_thread()
-    
+cooldown = Cooldown()
+journal = None
+watchdog = None
+params = None
+auth_watcher = None
+book_holder = SnapshotHolder()
+market = MarketStats()
+adaptive = None
+
+for _w in market.windows:
+    MARKET_VOL.labels(window=_w).set_function(lambda w=_w: market.state.vol_bps[w])
+    MARKET_DRIFT.labels(window=_w).set_function(lambda w=_w: market.state.drift_bps[w])
+    MARKET_IMBALANCE.labels(window=_w).set_function(lambda w=_w: market.state.imbalance_avg[w])
+    MARKET_DEPTH_RATIO.labels(window=_w).set_function(lambda w=_w: market.state.depth_ratio[w])
+
+
+
+def set_book(b):
+    book_holder.publish(b)
+    cooldown.check(b)
+    market.on_book(b)
+    if adaptive is not None:
+        adaptive.on_frame()
+
+
+def position_qty(p):
+    return float(p['qty']) if p and p.get('qty') else 0.0
+
+
+def is_fill_event(event):
+    if event.channel == "position":
+        return position_qty(event.data) != 0
+    if event.channel == "order":
+        return event.data.get('status') in ("filled", "partially_filled") or float(event.data.get('fill_qty') or 0) > 0
+    return False
+
+
+def on_position_event(event):
+    # WS 线程里只做唤醒和记 journal，事件本身由策略线程 drain 后按顺序处理
+    if event.channel == "position":
+        qty = position_qty(event.data)
+        if journal is not None and qty != journal.state.position_qty:
+            journal.record("position", qty=qty)
+        cooldown.wake("position")
+    if is_fill_event(event):
+        cooldown.wake("fill")
+
+
+def resync_positions(auth):
+    positions = query_positions(auth)
+    logger.info(f"position events gap, resynced from REST: {positions}")
+    return [Event(0, "position", p, None) for p in positions]
+
+
+position_events = EventQueue(listener=on_position_event)
+
+
+def watch_orders(cl_ord_ids):
+    if watchdog is not None:
+        watchdog.heartbeat()
+        watchdog.set_orders(cl_ord_ids)
+
+
+def main(book_ws, pos_ws, auth):
+    p = params.get()
+    backoff = CancelBackoff(p.backoff_base, p.backoff_factor, p.backoff_window, p.backoff_max)
+    BACKOFF_PENALTY.set_function(lambda: backoff._sec)
+    logger.info(f"Starting beggar with params: {p}")
+    last_cancel_reason = "start"
+    evaluated_version = None
+
     order_dict = None
     last_price = 0
     last_log_timestamp = 0
 
     while True:
+        LOOP_ITERATIONS.inc()
+        # 参数在每次评估前读取一次，控制接口的修改在下一轮生效
+        new_p = params.get()
+        if new_p is not p:
+            p = new_p
+            apply_backoff(backoff, p)
+        th = adaptive.update() if adaptive is not None else DEFAULT_THRESHOLDS
+        new_auth = auth_watcher.poll() if auth_watcher is not None else None
+        if new_auth is not None:
+            # 原地替换：common / watchdog / 网关客户端持有的是同一个 dict；仓位 WS 下次重连时用新 token
+            auth.update(new_auth)
+            pos_ws.access_token = new_auth['access_token']
+        position = p.position
+        if watchdog is not None:
+            watchdog.heartbeat()
+            if watchdog.tripped:
+                watchdog.tripped = False
+                if order_dict:
+                    logger.info("watchdog canceled resting orders, requoting")
+                    order_dict = None
+                    last_cancel_reason = "watchdog"
+                    CANCELS.labels(reason="watchdog").inc()
+        # 先清唤醒再取事件：此后到达的推送要么在这里取到，要么留着唤醒本轮后面的 sleep
+        cooldown.clear()
+        events, gap = position_events.drain()
+        if gap:
+            events += resync_positions(auth)
+        fill_event = next((e for e in events if is_fill_event(e)), None)
+        # 一次读取，盘口和时间戳一定来自同一次更新
+        st_book, book_version, st_book_ts = book_holder.get()
         if not st_book:
             logger.info("waiting for price data...")
-            time.sleep(1)
+            cooldown.sleep(1)
+            if _should_exit:
+                break
+            continue
+        if order_dict and not events and book_version == evaluated_version \
+        and time.time() - st_book_ts <= th.cancel_age:
+            # 这份盘口已经评估过且仍新鲜，bps/深度结果不会变，跳过
+            EVAL_SKIPPED.inc()
+            if _should_exit:
+                break
+            gc_control.idle()
+            time.sleep(0.05)
             continue
         mark_price = book_ws.get_mid_price(st_book)
         best_ask_price, best_bid_price = book_ws.get_best_ask_bid(st_book)
         if not mark_price:
             raise Exception("invalid mark price from ws")
+        # 市场统计给出的报价平移 / 暂停原因；平移同时作用于挂单距离和范围检查
+        shift, pause_reason = quote_adjustment(market.state, p)
+        QUOTE_SHIFT.set(shift)
         
         if order_dict:
             # long_diff_bps = (best_bid_price - order_dict['long_price']) / best_bid_price * 10000 if order_dict['long_cl_ord_id'] else None
             # short_diff_bps = (order_dict['short_price'] - best_ask_price) / best_ask_price * 10000 if order_dict['short_cl_ord_id'] else None
             
-            # mark_price
-            long_diff_bps = (mark_price - order_dict['long_price']) / mark_price * 10000 if order_dict['long_cl_ord_id'] else None 
-            short_diff_bps = (order_dict['short_price'] - mark_price) / mark_price * 10000 if order_dict['short_cl_ord_id'] else None
-
-            short_depeth = book_ws.depth_below_price(st_book, order_dict['short_price'])
-            long_depeth = book_ws.depth_above_price(st_book, order_dict['long_price'])
+            # mark_price，日志/节流只看最内档，范围检查逐档
+            long_orders, short_orders = order_dict['long'], order_dict['short']
+            long_bps, short_bps = ladder_bps(mark_price, long_orders, short_orders)
+            long_depths, short_depths = ladder_depths(book_ws, st_book, long_orders, short_orders)
+            long_diff_bps, short_diff_bps = long_bps[0], short_bps[0]
+            long_depeth, short_depeth = long_depths[0], short_depths[0]
+            QUOTE_BPS.labels(side="long").set(long_diff_bps)
+            QUOTE_BPS.labels(side="short").set(short_diff_bps)
+            QUOTE_DEPTH.labels(side="long").set(long_depeth)
+            QUOTE_DEPTH.labels(side="short").set(short_depeth)
             if last_price != mark_price:
                 last_price = mark_price
                 now_timestmp = time.time()
                 if now_timestmp - last_log_timestamp > 1:
                     logger.info(f'pos:{position}, mark_price: {mark_price}, best_ask: {best_ask_price}, best_bid: {best_bid_price}, long order bps: {long_diff_bps}, short order bps: {short_diff_bps}, long_depth:{format(long_depeth, ".3f")}, short_depth:{format(short_depeth, ".3f")}')
                     last_log_timestamp = now_timestmp
-            if st_position:
-                logger.info(f'st_position detect, pos:{position}, mark_price: {mark_price}, best_ask: {best_ask_price}, best_bid: {best_bid_price}, long order bps: {long_diff_bps}, short order bps: {short_diff_bps}, long_depth:{format(long_depeth, ".3f")}, short_depth:{format(short_depeth, ".3f")}')
-                if st_position['qty'] and float(st_position['qty']) != 0:
-                    logger.info("existing position detected, canceling orders and cleaning position")
-                    cancel_orders(auth, [cid for cid in [order_dict['long_cl_ord_id'], order_dict['short_cl_ord_id']] if cid])
-                    clean_positions(auth)
-                    order_dict = None
-                    logger.info("position cleaned, placing new orders after 900 seconds")
-                    for i in range(900):
-                        if _should_exit:
-                            break
-                        time.sleep(1)
+            if fill_event is not None:
+                logger.info(f'fill detected ({fill_event.channel} seq={fill_event.seq} data={fill_event.data}), pos:{position}, mark_price: {mark_price}, best_ask: {best_ask_price}, best_bid: {best_bid_price}, long order bps: {long_diff_bps}, short order bps: {short_diff_bps}, long_depth:{format(long_depeth, ".3f")}, short_depth:{format(short_depeth, ".3f")}')
+                logger.info("existing position detected, canceling orders and cleaning position")
+                cancel_orders(auth, [o['cl_ord_id'] for o in long_orders + short_orders])
+                watch_orders(())
+                CANCELS.labels(reason="fill").inc()
+                last_cancel_reason = "fill"
+                clean_positions(auth)
+                order_dict = None
+                # 清仓过程自己产生的推送不需要再处理
+                cooldown.clear()
+                position_events.drain()
+                logger.info("position cleaned, placing new orders after 900 seconds")
+                reason = cooldown.sleep(900, ("exit", "fill"))
+                if reason:
+                    logger.info(f"post-fill cooldown interrupted by {reason}")
+                if _should_exit:
+                    break
                 continue
             time_diff = time.time() - st_book_ts
-            if (long_diff_bps <= MIN_BPS or long_diff_bps >= MAX_BPS or short_diff_bps <= MIN_BPS or short_diff_bps >= MAX_BPS) \
-            or time_diff > 0.6 \
-            or (short_depeth < MIN_DEP or long_depeth < MIN_DEP):
+            BOOK_AGE.set(time_diff)
+            evaluated_version = book_version
+            if not ladder_in_range(long_orders, long_bps, long_depths, p.min_bps + shift, p.max_bps + shift, p.level_step_bps, p.min_dep) \
+            or not ladder_in_range(short_orders, short_bps, short_depths, p.min_bps + shift, p.max_bps + shift, p.level_step_bps, p.min_dep) \
+            or time_diff > th.cancel_age or pause_reason:
 
                 logger.info(f'out of range, pos:{position}, mark_price: {mark_price}, best_ask: {best_ask_price}, best_bid: {best_bid_price}, long order bps: {long_diff_bps}, short order bps: {short_diff_bps}, long_depth:{format(long_depeth, ".3f")}, short_depth:{format(short_depeth, ".3f")}, time_diff: {format(time_diff, ".3f")}')
-                cancel_orders(auth, [cid for cid in [order_dict['long_cl_ord_id'], order_dict['short_cl_ord_id']] if cid])
+                cancel_orders(auth, [o['cl_ord_id'] for o in long_orders + short_orders])
+                watch_orders(())
+                if time_diff > th.cancel_age:
+                    last_cancel_reason = "stale"
+                elif pause_reason:
+                    logger.info(f"market stats pause: {pause_reason}")
+                    last_cancel_reason = "market"
+                elif all(bps_in_range(o['level'], b, p.min_bps + shift, p.max_bps + shift, p.level_step_bps)
+                         for o, b in zip(long_orders + short_orders, long_bps + short_bps)):
+                    last_cancel_reason = "depth"
+                else:
+                    last_cancel_reason = "bps"
+                CANCELS.labels(reason=last_cancel_reason).inc()
                 clean_orders(auth)
                 order_dict = None
-                if abs(long_diff_bps) > THROTTLE_BPS or abs(short_diff_bps) > THROTTLE_BPS:
-                    logger.info(f"bps out of throttle range {THROTTLE_BPS}, canceling orders, sleeping for 300 seconds")
-                    time.sleep(300)
+                if abs(long_diff_bps) > p.throttle_bps + shift or abs(short_diff_bps) > p.throttle_bps + shift:
+                    logger.info(f"bps out of throttle range {p.throttle_bps + shift}, canceling orders, sleeping for 300 seconds")
+                    reason = cooldown.sleep(300, ("exit", "fill"))
+                    if reason:
+                        logger.info(f"throttle cooldown interrupted by {reason}")
                     backoff.penalty(3)
                 else:
                     next_sleep = backoff.next_sleep()
                     logger.info(f"bps out of range, canceling orders, sleeping for {next_sleep} seconds")
-                    for _ in range(int(next_sleep)):
-                        if st_position:
-                            break
-                        time.sleep(1)
+                    reason = cooldown.sleep(next_sleep, ("exit", "position"))
+                    if reason:
+                        logger.info(f"backoff cooldown interrupted by {reason}")
                 
         else:   
+            if fill_event is not None:
+                logger.info(f"fill detected without resting orders ({fill_event.channel} seq={fill_event.seq} data={fill_event.data}), cleaning position")
+                clean_positions(auth)
+                cooldown.clear()
+                position_events.drain()
             current_time = datetime.now(ZoneInfo("Asia/Shanghai"))
             current_hour = current_time.hour
             current_weekday = current_time.weekday()
             if current_weekday < 5:  # Skip on weekends
-                if SKIP_HOUR_START <= current_hour < SKIP_HOUR_END:
+                if p.skip_hour_start <= current_hour < p.skip_hour_end:
                     if order_dict:
                         clean_orders(auth)
                         order_dict = None
-                    logger.info(f'now is between {SKIP_HOUR_START} and {SKIP_HOUR_END}, skipping order creation')
-                    time.sleep(10)
+                        CANCELS.labels(reason="skip_hours").inc()
+                        last_cancel_reason = "skip_hours"
+                    logger.info(f'now is between {p.skip_hour_start} and {p.skip_hour_end}, skipping order creation')
+                    cooldown.sleep(10)
+                    if _should_exit:
+                        break
                     continue
+            if pause_reason:
+                logger.info(f"market stats pause: {pause_reason}, skipping order creation")
+                cooldown.sleep(1)
+                if _should_exit:
+                    break
+                continue
             clean_orders(auth)
-            long_order = {
-                'price': format(mark_price * (1 - BPS / 10000), ".2f"),
-                'qty': format(position / (mark_price * (1 - BPS / 10000)), ".4f"),
-                'side': 'buy',
-            }
-            short_order = {
-                'price': format(mark_price * (1 + BPS / 10000), ".2f"),
-                'qty': format(position / (mark_price * (1 + BPS / 10000)), ".4f"),
-                'side': 'sell',
-            }
+            long_orders, short_orders = build_ladder(mark_price, position, p.bps + shift, p.levels, p.level_step_bps)
             time_diff = time.time() - st_book_ts
-            if  time_diff > 0.3:
+            BOOK_AGE.set(time_diff)
+            if  time_diff > th.quote_age:
                 logger.info(f"book data too old, skipping order creation, { time_diff }")
-                time.sleep(1)
+                cooldown.sleep(1)
+                if _should_exit:
+                    break
                 continue
-            short_depeth = book_ws.depth_below_price(st_book, short_order['price'])
-            long_depeth = book_ws.depth_above_price(st_book, long_order['price'])
+            long_depths, short_depths = ladder_depths(book_ws, st_book, long_orders, short_orders)
+            long_depeth, short_depeth = long_depths[0], short_depths[0]
+            # 逐档检查深度，深度不够的档位不挂
+            long_orders = [o for o, d in zip(long_orders, long_depths) if d >= p.min_dep]
+            short_orders = [o for o, d in zip(short_orders, short_depths) if d >= p.min_dep]
 
-            if short_depeth < MIN_DEP or long_depeth < MIN_DEP:
+            if not long_orders or not short_orders:
                 next_sleep = backoff.next_sleep()
                 logger.info(f"not enough depth to place orders, long_depth:{format(long_depeth, '.3f')}, short_depth:{format(short_depeth, '.3f')}, skipping order creation for {next_sleep} seconds")
-                time.sleep(next_sleep)
+                outer_bps = p.bps + shift + (p.levels - 1) * p.level_step_bps
+                long_price = float(format(mark_price * (1 - outer_bps / 10000), ".2f"))
+                short_price = float(format(mark_price * (1 + outer_bps / 10000), ".2f"))
+                min_dep = p.min_dep
+                cooldown.watch("depth", lambda b: book_ws.depth_below_price(b, short_price) >= min_dep and book_ws.depth_above_price(b, long_price) >= min_dep)
+                reason = cooldown.sleep(next_sleep, ("exit", "fill", "depth"))
+                cooldown.unwatch("depth")
+                if reason:
+                    logger.info(f"depth cooldown interrupted by {reason}")
+                if _should_exit:
+                    break
                 continue
 
-            cl_ord_ids = create_orders(auth, [long_order, short_order])
+            cl_ord_ids = create_orders(auth, long_orders + short_orders)
+            REQUOTES.labels(reason=last_cancel_reason).inc()
+            watch_orders(cl_ord_ids)
+            for o, cl_ord_id in zip(long_orders + short_orders, cl_ord_ids):
+                o['cl_ord_id'] = cl_ord_id
             order_dict = {
-                'long_cl_ord_id': cl_ord_ids[0],
-                'short_cl_ord_id': cl_ord_ids[1],
-                'long_price': float(long_order['price']),
-                'short_price': float(short_order['price']),
+                'long': long_orders,
+                'short': short_orders,
             }
+            evaluated_version = None
         if _should_exit:
             break
+        gc_control.idle()
         time.sleep(0.05)
 
 
@@ -182,42 +349,127 @@ if __name__ == "__main__":
     parser.add_argument("--min_bps", default=7, type=float, help="Min BPS for order placement")
     parser.add_argument("--throttle_bps", default=12, type=float, help="BPS for throttling order placement when market is unfavorable")
     parser.add_argument("--min_dep", default=4, type=float, help="Minimum depth required to place orders")
-    parser.add_argument("--auth", default="standx_beggar_auth.json", type=str, help="Path to auth json file")
+    parser.add_argument("--levels", default=1, type=int, help="Number of ladder levels per side")
+    parser.add_argument("--level_step_bps", default=1, type=float, help="BPS spacing between ladder levels")
+    parser.add_argument("--stats_window", default=60, type=int, help="Market stats window in seconds used for quote adjustment (10/60/300)")
+    parser.add_argument("--vol_k", default=0, type=float, help="Shift quote bps by vol_k * (realized vol - vol_ref_bps) (0 = disabled)")
+    parser.add_argument("--vol_ref_bps", default=0, type=float, help="Realized vol over stats_window considered normal")
+    parser.add_argument("--max_shift_bps", default=5, type=float, help="Upper bound of the vol-driven quote shift")
+    parser.add_argument("--pause_vol_bps", default=0, type=float, help="Pause quoting when realized vol exceeds this (0 = disabled)")
+    parser.add_argument("--pause_drift_bps", default=0, type=float, help="Pause quoting when |mid drift| exceeds this (0 = disabled)")
+    parser.add_argument("--pause_imbalance", default=0, type=float, help="Pause quoting when |book imbalance| exceeds this (0 = disabled)")
+    parser.add_argument("--pause_depth_ratio", default=0, type=float, help="Pause quoting when depth / rolling average depth falls below this (0 = disabled)")
+    parser.add_argument("--auth", default="standx_beggar_auth.json", type=str, help="Path to auth json file or auth store")
+    parser.add_argument("--account", default="", type=str, help="Account name when --auth is a multi-account auth store")
+    parser.add_argument("--book_levels", default=0, type=int, help="Only keep the top N depth_book levels per side (0 = all)")
+    parser.add_argument("--profile_window", default=30, type=float, help="Seconds sampled per SIGUSR1 profiling run")
+    parser.add_argument("--profile_dir", default="profiles", type=str, help="Directory for profiler output")
+    parser.add_argument("--metrics_port", default=0, type=int, help="Serve Prometheus metrics on 127.0.0.1:<port> (0 = disabled)")
+    parser.add_argument("--journal", default=None, type=str, help="Order/position journal used for crash recovery (default beggar_journal[.<account>].jsonl, '' = disabled)")
+    parser.add_argument("--fault_scenario", default="", type=str, help="Fault/latency injection scenario file (testing only)")
+    parser.add_argument("--watchdog_ms", default=1500, type=float, help="Cancel resting orders when the strategy heartbeat is older than this (0 = disabled)")
+    parser.add_argument("--watchdog_book_ms", default=2000, type=float, help="Cancel resting orders when the book is older than this")
+    parser.add_argument("--control_socket", default=None, type=str, help="UNIX socket for runtime control (default beggar[.<account>].sock, '' = disabled)")
+    parser.add_argument("--gateway", default="", type=str, help="Send orders/queries through a gateway.py process on this UNIX socket ('' = in-process HTTP)")
+    parser.add_argument("--adaptive_interval", default=5, type=float, help="Seconds between adaptive threshold updates (0 = fixed 0.3s/0.6s/1s thresholds)")
+    parser.add_argument("--gc_young_threshold", default=0, type=int, help="Freeze startup objects and run young GC only in idle windows once this many allocations are pending (0 = default GC)")
+    parser.add_argument("--keep_warm_idle", default=15, type=float, help="Ping the exchange to keep pooled connections warm after this many idle seconds (0 = disabled)")
+    parser.add_argument("--restart_delay", default=1, type=float, help="Seconds to wait before restarting the strategy after a crash")
     args = parser.parse_args()
-
-
-    global BPS, MAX_BPS, MIN_BPS, THROTTLE_BPS, MIN_DEP
-    BPS = args.bps
-    MAX_BPS = args.max_bps
-    MIN_BPS = args.min_bps
-    THROTTLE_BPS = args.throttle_bps
-    MIN_DEP = args.min_dep
-
-
-
-    with open(args.auth, "r") as f:
-        auth_json = json.load(f)
-        auth = {
-            'access_token': auth_json['access_token'],
-            'signing_key': SigningKey(bytes.fromhex(auth_json['signing_key'])),
-        }
-    print(f"Starting beggar with position: {args.position}, bps: {BPS}, max_bps: {MAX_BPS}, min_bps: {MIN_BPS}, throttle_bps: {THROTTLE_BPS}, min_dep: {MIN_DEP}")
-    while True:
-        try:
-            clean_orders(auth)
-            clean_positions(auth)
-            main(args.position, auth)
-        except Exception as e:
-            logger.info(f"Exception in beggar: {e} traceback: {e.__traceback__}")
-        finally:
-            clean_orders(auth)
-            clean_positions(auth)
-        if _should_exit:
-            break
-        for i in range(120):
-            time.sleep(1)
-            clean_orders(auth)
-            clean_positions(auth)
-            print(f"Restarting beggar in {120 - i} seconds...")
-
-
+    # 多账户时每个 bot 默认用自己的 journal 和控制 socket，同目录下起多个也不会互相覆盖
+    suffix = f".{args.account}" if args.account else ""
+    if args.journal is None:
+        args.journal = f"beggar_journal{suffix}.jsonl"
+    if args.control_socket is None:
+        args.control_socket = f"beggar{suffix}.sock"
+
+
+    params = ParamStore(Params(
+        position=args.position,
+        bps=args.bps,
+        max_bps=args.max_bps,
+        min_bps=args.min_bps,
+        throttle_bps=args.throttle_bps,
+        min_dep=args.min_dep,
+        levels=args.levels,
+        level_step_bps=args.level_step_bps,
+        skip_hour_start=SKIP_HOUR_START,
+        skip_hour_end=SKIP_HOUR_END,
+        backoff_base=2,
+        backoff_factor=2,
+        backoff_window=90,
+        backoff_max=None,
+        stats_window=args.stats_window,
+        vol_k=args.vol_k,
+        vol_ref_bps=args.vol_ref_bps,
+        max_shift_bps=args.max_shift_bps,
+        pause_vol_bps=args.pause_vol_bps,
+        pause_drift_bps=args.pause_drift_bps,
+        pause_imbalance=args.pause_imbalance,
+        pause_depth_ratio=args.pause_depth_ratio,
+    ))
+
+
+
+    auth = load_auth(args.auth, args.account or None)
+    auth_watcher = AuthWatcher(args.auth, args.account or None)
+    print(f"Starting beggar with {params.get()}")
+    if args.fault_scenario:
+        faults.load_scenario(args.fault_scenario)
+
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+
+    if args.keep_warm_idle and not args.gateway:
+        st_http.start_keep_warm(idle=args.keep_warm_idle, connections=min(2 * args.levels, st_http.POOL_SIZE))
+
+    if args.adaptive_interval:
+        adaptive = AdaptiveController(interval=args.adaptive_interval)
+
+    if args.gateway:
+        use_gateway(GatewayClient(args.gateway, auth=auth))
+
+    if args.journal:
+        journal = Journal(args.journal)
+        set_journal(journal)
+
+    if args.watchdog_ms:
+        watchdog = Watchdog(
+            auth,
+            book_holder,
+            heartbeat_ms=args.watchdog_ms,
+            book_age_ms=args.watchdog_book_ms,
+            on_cancel=(lambda ids: journal.record("cancel", cl_ord_ids=ids)) if journal is not None else None,
+        )
+        watchdog.start()
+
+    profiler = SamplingProfiler(window=args.profile_window, out_dir=args.profile_dir)
+    install_signal_handler(profiler)
+
+    control = None
+    if args.control_socket:
+        control = ControlServer(args.control_socket, {
+            "get": lambda req: params.get()._asdict(),
+            "set": lambda req: params.update(req.get("params", {}))._asdict(),
+            "profile": lambda req: profiler.start(req.get("window")),
+        })
+        control.start()
+
+    if args.gc_young_threshold:
+        gc_control.enable(args.gc_young_threshold)
+
+    supervisor = Supervisor(
+        auth,
+        set_book,
+        position_events,
+        restart_delay=args.restart_delay,
+        should_exit=lambda: _should_exit,
+        cooldown=cooldown,
+        book_levels=args.book_levels,
+        watchdog=watchdog,
+    )
+    supervisor.run(main, auth)
+    if journal is not None:
+        journal.close()
+    if control is not None:
+        control.stop()
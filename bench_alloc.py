@@ -0,0 +1,163 @@
+"""
+分配/尾延迟基准：用合成的 depth_book 帧跑“解码 + 市场统计 + 挂单期间一轮评估 + 下单请求体”，
+  - tracemalloc 统计评估 + 请求体阶段每轮的瞬时分配峰值（字节；解码两边相同，不计入）
+  - 循环内自动 GC 触发次数（gc.callbacks，不含 gc_control 安排在空闲窗口的回收）
+  - 关掉 tracemalloc 后测每轮耗时分位数，对比默认 GC 和 gc_control（freeze + 空闲窗口回收）
+
+  python bench_alloc.py --iterations 20000 --levels 100
+"""
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import st_http
+import gc_control
+from st_ws import StandXBookWS
+from ladder import build_ladder, ladder_bps, ladder_depths, ladder_in_range
+from market_stats import MarketStats
+
+
+def make_frames(n, levels, mid=100000.0):
+    frames = []
+    for _ in range(n):
+        mid *= 1 + random.gauss(0, 1e-5)
+        asks = [[f"{mid + 0.5 + i * 0.5:.2f}", f"{random.uniform(0.01, 2):.4f}"] for i in range(levels)]
+        bids = [[f"{mid - 0.5 - i * 0.5:.2f}", f"{random.uniform(0.01, 2):.4f}"] for i in range(levels)]
+        random.shuffle(asks)
+        random.shuffle(bids)
+        frames.append(json.dumps({"channel": "depth_book", "data": {"symbol": "BTC-USD", "asks": asks, "bids": bids}}))
+    return frames
+
+
+# ---- 改动前的写法，只作对照 ----
+
+def _legacy_mid(data):
+    best_ask = min(float(p) for p, _ in data['asks'])
+    best_bid = max(float(p) for p, _ in data['bids'])
+    return (best_ask + best_bid) / 2
+
+
+def _legacy_depth(levels, price, above):
+    price = float(price)
+    total_qty = 0
+    for p_str, qty_str in levels:
+        p = float(p_str)
+        qty = float(qty_str)
+        if (p >= price) if above else (p <= price):
+            total_qty += qty
+    return total_qty
+
+
+def _legacy_payload(price, qty, side, cl_ord_id):
+    data = {
+        "symbol": st_http.PAIR,
+        "side": side,
+        "order_type": "limit",
+        "qty": qty,
+        "price": str(price),
+        "margin_mode": "cross",
+        "time_in_force": "alo",
+        "reduce_only": False,
+        "cl_ord_id": cl_ord_id,
+    }
+    return json.dumps(data, separators=(",", ":"))
+
+
+def legacy_evaluate(book_ws, book, orders):
+    mark_price = _legacy_mid(book)
+    long_orders, short_orders = orders
+    long_bps = [(mark_price - float(o['price'])) / mark_price * 10000 for o in long_orders]
+    short_bps = [(float(o['price']) - mark_price) / mark_price * 10000 for o in short_orders]
+    long_depths = [_legacy_depth(book["bids"], o['price'], True) for o in long_orders]
+    short_depths = [_legacy_depth(book["asks"], o['price'], False) for o in short_orders]
+    ladder_in_range(long_orders, long_bps, long_depths, 7, 10, 1, 4)
+    ladder_in_range(short_orders, short_bps, short_depths, 7, 10, 1, 4)
+    o = long_orders[0]
+    _legacy_payload(o['price'], o['qty'], o['side'], "00000000-0000-0000-0000-000000000000")
+
+
+def lean_evaluate(book_ws, book, orders):
+    mark_price = book_ws.get_mid_price(book)
+    long_orders, short_orders = orders
+    long_bps, short_bps = ladder_bps(mark_price, long_orders, short_orders)
+    long_depths, short_depths = ladder_depths(book_ws, book, long_orders, short_orders)
+    ladder_in_range(long_orders, long_bps, long_depths, 7, 10, 1, 4)
+    ladder_in_range(short_orders, short_bps, short_depths, 7, 10, 1, 4)
+    o = long_orders[0]
+    st_http._ORDER_TEMPLATE % (o['side'], json.dumps(o['qty']), o['price'], "00000000-0000-0000-0000-000000000000")
+
+
+def measure_alloc(evaluate, book_ws, frames, orders):
+    market = MarketStats()
+    peaks = []
+    tracemalloc.start()
+    for raw in frames:
+        book = book_ws.decode(raw)
+        market.on_book(book)
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        evaluate(book_ws, book, orders)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks), max(peaks)
+
+
+def measure_latency(evaluate, book_ws, frames, orders):
+    market = MarketStats()
+    durations = []
+    collections = [0]
+
+    def _on_gc(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    gc.callbacks.append(_on_gc)
+    for raw in frames:
+        t0 = time.perf_counter()
+        book = book_ws.decode(raw)
+        market.on_book(book)
+        evaluate(book_ws, book, orders)
+        durations.append(time.perf_counter() - t0)
+        gc_control.idle()
+    gc.callbacks.remove(_on_gc)
+    durations.sort()
+    n = len(durations)
+    result = {f"p{q * 100:g}": f"{durations[min(n - 1, int(q * n))] * 1e6:.1f}us" for q in (0.5, 0.99, 0.999)}
+    result["max"] = f"{durations[-1] * 1e6:.1f}us"
+    result["gc_in_loop"] = collections[0] - (gc_control.controller.collections if gc_control.controller else 0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", default=20000, type=int)
+    parser.add_argument("--levels", default=100, type=int, help="Levels per side in each synthetic frame")
+    parser.add_argument("--ladder_levels", default=3, type=int)
+    parser.add_argument("--gc_young_threshold", default=20000, type=int)
+    args = parser.parse_args()
+
+    frames = make_frames(args.iterations, args.levels)
+    book_ws = StandXBookWS(lambda b: None)
+    orders = build_ladder(100000.0, 1000, 8, args.ladder_levels, 1)
+    # 常驻的垃圾对象，模拟长时间运行后 GC 每次都要扫描的存量
+    ballast = [{"i": i, "l": [i]} for i in range(200000)]
+
+    for name, fn in (("legacy", legacy_evaluate), ("lean", lean_evaluate)):
+        avg, peak = measure_alloc(fn, book_ws, frames[:min(len(frames), 5000)], orders)
+        print(f"{name:>6} eval alloc/iter: avg peak={avg:.0f}B max peak={peak}B")
+
+    for name, fn in (("legacy", legacy_evaluate), ("lean", lean_evaluate)):
+        print(f"{name:>6} default gc: {measure_latency(fn, book_ws, frames, orders)}")
+
+    gc_control.enable(args.gc_young_threshold)
+    print(f"{'lean':>6} gc_control: {measure_latency(lean_evaluate, book_ws, frames, orders)}")
+    print(f"scheduled collections={gc_control.controller.collections} max pause={gc_control.controller.pause_max * 1e6:.1f}us")
+    del ballast
+
+
+if __name__ == "__main__":
+    main()
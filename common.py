@@ -1,15 +1,72 @@
 import os
 import time
+import uuid
 import requests
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from st_http import query_orders, query_positions, maker_clean_position, taker_clean_position, cancel_orders, create_order
+import st_http
+from st_http import POOL_SIZE
 import logging
 
 logger = logging.getLogger(__name__)
 
 LARK_URL = os.getenv("LARK_URL", "")
 
+# 常驻下单线程池：阶梯单的所有档位并发走 keep-alive 连接，不再每次新建线程
+_order_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="order")
+
+# 订单/仓位 journal（journal.Journal），由 beg2 启动时 set_journal 设置
+journal = None
+
+
+def set_journal(j):
+    global journal
+    journal = j
+
+
+# 下单/查询后端：默认进程内直接走 st_http，use_gateway 后改走独立网关进程（gateway.GatewayClient）
+api = st_http
+
+
+def use_gateway(client):
+    global api
+    api = client
+    logger.info(f"order api switched to gateway {client.path}")
+
+
+def query_orders(auth):
+    return api.query_orders(auth)
+
+
+def query_positions(auth):
+    return api.query_positions(auth)
+
+
+def create_order(auth, price, qty, side, cl_ord_id=None):
+    return api.create_order(auth, price, qty, side, cl_ord_id=cl_ord_id)
+
+
+def taker_clean_position(auth, qty, side):
+    return api.taker_clean_position(auth, qty, side)
+
+
+def _record(event, **fields):
+    if journal is not None:
+        journal.record(event, **fields)
+
+
+def cancel_orders(auth, cl_ord_ids):
+    resp = api.cancel_orders(auth, cl_ord_ids)
+    if cl_ord_ids:
+        _record("cancel", cl_ord_ids=list(cl_ord_ids))
+    return resp
+
+
+def maker_clean_position(auth, price, qty, side):
+    cl_ord_id = str(uuid.uuid4())
+    _record("intent", cl_ord_id=cl_ord_id, side=side, price=str(price), qty=str(qty))
+    return api.maker_clean_position(auth, price, qty, side, cl_ord_id=cl_ord_id)
+
 
 def send_lark_message(message: str):
     if not LARK_URL:
@@ -86,15 +143,27 @@ def clean_positions(auth):
 
 
 def create_orders(auth, orders):
-    def _create_one(order):
-        return create_order(
-            auth,
-            order['price'],
-            order['qty'],
-            order['side'],
-        )
-    with ThreadPoolExecutor(max_workers=5) as ex:
-        return list(ex.map(_create_one, orders))
+    """
+    并发提交一批订单，返回与 orders 对应的 cl_ord_id 列表。
+    任意一单失败时，把已成功的单一次性撤掉再抛出异常，避免留下策略不知道的挂单。
+    """
+    cl_ord_ids = [str(uuid.uuid4()) for _ in orders]
+    for order, cl_ord_id in zip(orders, cl_ord_ids):
+        _record("intent", cl_ord_id=cl_ord_id, side=order['side'], price=order['price'], qty=order['qty'])
+    futures = [
+        _order_pool.submit(create_order, auth, order['price'], order['qty'], order['side'], cl_ord_id)
+        for order, cl_ord_id in zip(orders, cl_ord_ids)
+    ]
+    wait(futures)
+    for f, cl_ord_id in zip(futures, cl_ord_ids):
+        _record("ack" if f.exception() is None else "reject", cl_ord_id=cl_ord_id)
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        placed = [f.result() for f in futures if f.exception() is None]
+        logger.info(f"create_orders: {len(errors)}/{len(orders)} failed, canceling placed orders: {placed}")
+        cancel_orders(auth, placed)
+        raise errors[0]
+    return [f.result() for f in futures]
 
 
 def clean_orders(auth):
@@ -107,4 +176,34 @@ def clean_orders(auth):
             time.sleep(0.1)
         else:
             logger.info("no open orders to cancel")
-            break
\ No newline at end of file
+            _record("clean")
+            break
+
+
+def recover(auth):
+    """
+    按 journal 恢复：一次性撤掉 journal 里已知的挂单，再各查一次挂单和仓位确认干净。
+    只有 journal 之外还有挂单/仓位时，才回退到 clean_orders / clean_positions 的暴力清理。
+    没有 journal 时同样可用，只是少了第一步。
+    journal 里的 id 可能早已成交/撤掉，这一步失败（比如未知 cl_ord_id 的 4xx）只记日志，
+    后面以交易所为准的挂单/仓位检查照常执行。
+    """
+    known = list(journal.state.open_orders) if journal is not None else []
+    if known:
+        logger.info(f"recover: canceling {len(known)} journaled orders: {known}")
+        try:
+            cancel_orders(auth, known)
+        except Exception as e:
+            logger.info(f"recover: canceling journaled orders failed, relying on query: {e!r}")
+    if query_orders(auth).get("result", []):
+        logger.info("recover: unknown open orders found, falling back to clean_orders")
+        clean_orders(auth)
+    else:
+        _record("clean")
+    positions = query_positions(auth)
+    if [position for position in positions if position['qty'] and float(position['qty']) != 0]:
+        logger.info("recover: open position found, cleaning positions")
+        clean_positions(auth)
+    else:
+        _record("position", qty=0)
+    logger.info("recover: done")
\ No newline at end of file
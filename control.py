@@ -0,0 +1,110 @@
+"""
+本地控制接口（UNIX socket），一行一个 JSON 请求 / 一行一个 JSON 响应：
+  {"cmd": "get"}
+  {"cmd": "set", "params": {"bps": 8, "min_dep": 3}}
+  {"cmd": "profile", "window": 30}
+
+命令行客户端：
+  python control.py --socket beggar.sock get
+  python control.py --socket beggar.sock set bps=8 min_dep=3
+  python control.py --socket beggar.sock profile 30
+"""
+import os
+import json
+import socket
+import argparse
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ControlServer:
+    def __init__(self, path, handlers):
+        self.path = path
+        self.handlers = handlers
+        self._sock = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            # 还能连上说明另一个进程正在用这个 socket，不能把它顶掉；连不上才是崩溃留下的残留文件
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"control socket {self.path} is in use by another process")
+            finally:
+                probe.close()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._sock.listen(4)
+        t = threading.Thread(target=self._accept_loop, name="control", daemon=True)
+        t.start()
+        logger.info(f"control socket listening on {self.path}")
+        return t
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn, conn.makefile("rwb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                f.write(json.dumps(self.handle(line)).encode("utf-8") + b"\n")
+                f.flush()
+
+    def handle(self, line):
+        try:
+            req = json.loads(line)
+            handler = self.handlers.get(req.get("cmd"))
+            if handler is None:
+                return {"ok": False, "error": f"unknown cmd, available: {sorted(self.handlers)}"}
+            return {"ok": True, "result": handler(req)}
+        except Exception as e:
+            logger.info(f"control request failed: {line!r} {e}")
+            return {"ok": False, "error": str(e)}
+
+
+def request(path, req, timeout=5):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        with s.makefile("rwb") as f:
+            f.write(json.dumps(req).encode("utf-8") + b"\n")
+            f.flush()
+            return json.loads(f.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default="beggar.sock", type=str)
+    parser.add_argument("cmd")
+    parser.add_argument("args", nargs="*")
+    args = parser.parse_args()
+
+    req = {"cmd": args.cmd}
+    if args.cmd == "set":
+        req["params"] = dict(a.split("=", 1) for a in args.args)
+    elif args.cmd == "profile" and args.args:
+        req["window"] = float(args.args[0])
+    print(json.dumps(request(args.socket, req), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
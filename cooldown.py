@@ -0,0 +1,85 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 一旦触发就一直有效的唤醒原因（不会被 sleep 消费掉）
+STICKY = frozenset({"exit"})
+
+
+class Cooldown:
+    """
+    可中断的等待：替代 time.sleep，任何 wait 都能被 exit / 仓位变化 / 市场条件立即唤醒。
+
+      cooldown.wake("exit")                 # 信号处理里调用
+      cooldown.watch("depth", predicate)    # predicate(book) 为真时唤醒 "depth"
+      cooldown.check(book)                  # 行情回调里调用，检查 watch 条件
+      cooldown.clear()                      # 策略读取事件、做决策的地方调用
+      reason = cooldown.sleep(300, ("exit", "fill"))
+    """
+
+    def __init__(self):
+        # RLock：信号处理函数在主线程里重入也不会死锁
+        self._cond = threading.Condition(threading.RLock())
+        self._pending = set()
+        self._watches = {}
+
+    def wake(self, reason):
+        with self._cond:
+            self._pending.add(reason)
+            self._cond.notify_all()
+
+    def clear(self, reasons=None):
+        """
+        在做决策的地方调用（消费完事件之后），丢掉此前的非 sticky 唤醒；
+        reasons 为 None 时清掉全部非 sticky 原因。
+        """
+        with self._cond:
+            if reasons is None:
+                self._pending &= STICKY
+            else:
+                self._pending -= set(reasons) - STICKY
+
+    def is_set(self, reason):
+        return reason in self._pending
+
+    def watch(self, name, predicate):
+        self._watches[name] = predicate
+
+    def unwatch(self, name):
+        self._watches.pop(name, None)
+
+    def check(self, data):
+        if not self._watches:
+            return
+        for name, predicate in list(self._watches.items()):
+            try:
+                hit = predicate(data)
+            except Exception as e:
+                logger.info(f"cooldown watch {name} failed: {e}")
+                continue
+            if hit:
+                # 市场条件是一次性的，触发后自动移除
+                self.unwatch(name)
+                self.wake(name)
+
+    def sleep(self, seconds, wake_on=("exit",)):
+        """
+        最多等待 seconds 秒；被 wake_on 中的原因唤醒时返回该原因，超时返回 None。
+        上次 clear() 之后、进入等待之前触发的原因同样有效（比如撤单请求在途时到达的成交），
+        此时立即返回。
+        """
+        deadline = time.monotonic() + seconds
+        with self._cond:
+            while True:
+                for reason in wake_on:
+                    if reason in self._pending:
+                        if reason not in STICKY:
+                            self._pending.discard(reason)
+                        return reason
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
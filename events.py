@@ -0,0 +1,72 @@
+import itertools
+import logging
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+# seq 为本地单调递增序号，remote_seq 为交易所推送里的 seq（没有则为 None）
+Event = namedtuple("Event", ["seq", "channel", "data", "remote_seq"])
+
+
+class EventQueue:
+    """
+    仓位/订单推送的有序有界队列：WS 线程 push，策略线程按顺序 drain，不再只保留最后一个值。
+
+    以下情况记为 gap，drain 时返回 gap=True，由策略做一次 REST 重新同步：
+      - 同一 channel 的交易所 seq 不连续
+      - 队列满了丢掉最旧的事件
+      - WS 断线重连（断线期间的推送收不到）
+    deque 的 append/popleft 是原子的，producer/consumer 之间不加锁；
+    gap 用只增不减的计数 gaps 表示（只有 WS 线程写），drain 和上次看到的值比较，不会丢。
+    """
+
+    def __init__(self, maxlen=1024, listener=None):
+        self.maxlen = maxlen
+        self.listener = listener
+        self.gaps = 0
+        self._q = deque()
+        self._seq = itertools.count(1)
+        self._last_remote = {}
+        self._gaps_seen = 0
+        self._connected_once = False
+
+    def _mark_gap(self, why):
+        self.gaps += 1
+        logger.info(f"event queue gap: {why}")
+
+    def on_connect(self):
+        if self._connected_once:
+            self._mark_gap("ws reconnected")
+        self._connected_once = True
+        self._last_remote.clear()
+
+    def push(self, channel, data, remote_seq=None):
+        if remote_seq is not None:
+            last = self._last_remote.get(channel)
+            if last is not None and remote_seq != last + 1:
+                self._mark_gap(f"{channel} seq {last} -> {remote_seq}")
+            self._last_remote[channel] = remote_seq
+        if len(self._q) >= self.maxlen:
+            self._q.popleft()
+            self._mark_gap("queue overflow")
+        event = Event(next(self._seq), channel, data, remote_seq)
+        self._q.append(event)
+        if self.listener is not None:
+            self.listener(event)
+
+    def drain(self):
+        """返回 (按顺序的事件列表, 是否出现过 gap)。"""
+        events = []
+        while True:
+            try:
+                events.append(self._q.popleft())
+            except IndexError:
+                break
+        gaps = self.gaps
+        gap = gaps != self._gaps_seen
+        self._gaps_seen = gaps
+        return events, gap
+
+    def __len__(self):
+        return len(self._q)
@@ -0,0 +1,371 @@
+"""
+故障注入基准：本地起一个假交易所 HTTP 服务，把 st_http.BASE_URL 指过去，按 scenario 注入故障后测：
+  - cancel 反应时间：决定撤单 -> cancel_orders 返回（成功或最终失败）
+  - 暴露窗口：决定撤单 -> 确认撤单成功（cancel 失败时用 clean_orders 兜底直到成功）
+  - 下单确认时间：create_orders 两档（失败计入 failed）
+  - 行情：按 10ms 一帧模拟 depth_book，经注入层后统计帧延迟和最长断档
+  - 策略反应：beg2 的策略循环 + watchdog 整体跑在合成盘口上（经 Supervisor 重启），测
+      行情跳动（挂单出范围）-> 假交易所上这些挂单全部撤掉
+      盘口停顿（scenario 的 ws stall 开始）-> 假交易所上这些挂单全部撤掉
+    以及撤单是策略还是 watchdog 完成的。时间以假交易所处理撤单的时刻为准，比客户端收到确认早一个本地 RTT。
+
+  python fault_bench.py scenarios/*.json --iterations 50 --reaction_seconds 60 --report report.md
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from nacl.signing import SigningKey
+
+import st_http
+import common
+import faults
+import beg2
+from cooldown import Cooldown
+from params import Params, ParamStore
+from rate_limit import RequestScheduler
+from supervisor import Supervisor
+from watchdog import Watchdog
+from logconf import setup_logging
+
+setup_logging(logging.WARNING)
+
+
+class ExchangeState:
+    """假交易所的挂单簿和撤单记录（服务端时间），用来事后计算暴露窗口。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = set()
+        self.cancels = []   # (monotonic ts, cl_ord_ids, source)
+
+    def reset(self):
+        with self.lock:
+            self.open = set()
+            self.cancels = []
+
+    def add(self, cl_ord_id):
+        with self.lock:
+            self.open.add(cl_ord_id)
+
+    def cancel(self, cl_ord_ids, source):
+        with self.lock:
+            self.open.difference_update(cl_ord_ids)
+            self.cancels.append((time.monotonic(), set(cl_ord_ids), source))
+
+    def snapshot(self):
+        with self.lock:
+            return frozenset(self.open)
+
+    def open_orders(self):
+        with self.lock:
+            return [{"cl_ord_id": cl_ord_id} for cl_ord_id in self.open]
+
+    def exposure(self, onset, resting):
+        """onset 时挂着的 resting 全部被撤掉所用的时间和最后一笔撤单的来源；没撤完返回 (None, None)。"""
+        remaining = set(resting)
+        with self.lock:
+            cancels = list(self.cancels)
+        for ts, cl_ord_ids, source in cancels:
+            if ts < onset:
+                continue
+            remaining -= cl_ord_ids
+            if not remaining:
+                return ts - onset, source
+        return None, None
+
+
+exchange = ExchangeState()
+
+
+class _FakeExchange(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 头和 body 分两次写，不关 Nagle 会和客户端的延迟 ACK 叠出 40ms
+    disable_nagle_algorithm = True
+
+    def _reply(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith("/api/query_open_orders"):
+            self._reply({"result": exchange.open_orders()})
+        elif self.path.startswith("/api/query_positions"):
+            self._reply([])
+        else:
+            self._reply({})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/api/new_order") and body.get("time_in_force") == "alo":
+            exchange.add(body["cl_ord_id"])
+        elif self.path.startswith("/api/cancel_orders"):
+            exchange.cancel(body.get("cl_ord_id_list", []), self.headers.get("X-Bench-Source", "strategy"))
+        self._reply({"code": 0})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_exchange():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeExchange)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summary(name, values, failed=0):
+    if not values:
+        return f"  {name:<22} n=0 failed={failed}"
+    return (
+        f"  {name:<22} n={len(values)} failed={failed} "
+        f"p50={pct(values, 0.5) * 1000:.0f}ms p90={pct(values, 0.9) * 1000:.0f}ms "
+        f"p99={pct(values, 0.99) * 1000:.0f}ms max={max(values) * 1000:.0f}ms"
+    )
+
+
+def bench_orders(auth, iterations, pause=0.2):
+    reaction, exposure, create = [], [], []
+    reaction_failed = create_failed = 0
+    for _ in range(iterations):
+        # 连着压会被 scheduler 的令牌桶限速，测到的是排队而不是链路；每轮之间留出补充令牌的时间
+        time.sleep(pause)
+        t0 = time.perf_counter()
+        try:
+            common.create_orders(auth, [
+                {'price': "99900.00", 'qty': "0.0050", 'side': 'buy'},
+                {'price': "100100.00", 'qty': "0.0050", 'side': 'sell'},
+            ])
+            create.append(time.perf_counter() - t0)
+        except Exception:
+            create_failed += 1
+
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            common.cancel_orders(auth, ["bench-a", "bench-b"])
+            ok = True
+        except Exception:
+            reaction_failed += 1
+        reaction.append(time.perf_counter() - t0)
+        while not ok:
+            try:
+                common.clean_orders(auth)
+                ok = True
+            except Exception:
+                pass
+        exposure.append(time.perf_counter() - t0)
+    return [
+        summary("create ack", create, create_failed),
+        summary("cancel reaction", reaction, reaction_failed),
+        summary("exposure window", exposure),
+    ]
+
+
+def bench_feed(duration, interval=0.01):
+    latencies = []
+    deliveries = []
+
+    class _WS:
+        def close(self):
+            pass
+
+    def on_message(ws, message):
+        now = time.monotonic()
+        latencies.append(now - float(message))
+        deliveries.append(now)
+
+    handler = faults.injector.wrap_ws("depth_book", on_message) if faults.injector else on_message
+    start = time.monotonic()
+    i = 0
+    while time.monotonic() - start < duration:
+        scheduled = start + i * interval
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        handler(_WS(), repr(scheduled))
+        i += 1
+    gaps = [b - a for a, b in zip(deliveries, deliveries[1:])]
+    return [
+        summary("frame latency", latencies, i - len(latencies)),
+        f"  {'max book age':<22} {max(gaps, default=0) * 1000:.0f}ms",
+    ]
+
+
+def _book_frame(mid, levels=150, step=1.0, qty="0.5000"):
+    asks = [[f"{mid + step * (i + 1):.2f}", qty] for i in range(levels)]
+    bids = [[f"{mid - step * (i + 1):.2f}", qty] for i in range(levels)]
+    return json.dumps({"channel": "depth_book", "data": {"symbol": st_http.PAIR, "asks": asks, "bids": bids}})
+
+
+BENCH_PARAMS = Params(
+    position=1000, bps=8.5, max_bps=10, min_bps=7, throttle_bps=12, min_dep=1, levels=1, level_step_bps=1,
+    skip_hour_start=0, skip_hour_end=0, backoff_base=0.5, backoff_factor=1, backoff_window=90, backoff_max=None,
+    stats_window=60, vol_k=0, vol_ref_bps=0, max_shift_bps=5, pause_vol_bps=0, pause_drift_bps=0,
+    pause_imbalance=0, pause_depth_ratio=0,
+)
+
+
+class _BenchSupervisor(Supervisor):
+    """行情由 bench_reaction 直接喂，不连真实 WS。"""
+
+    def start_feeds(self):
+        pass
+
+    def stop_feeds(self):
+        pass
+
+
+def bench_reaction(auth, duration, move_every=3.0, move_bps=3.0, interval=0.01):
+    """
+    beg2 策略循环 + watchdog 跑在合成盘口上：每 move_every 秒 mid 来回跳 move_bps（挂单出 [min_bps, max_bps]
+    但不超过 throttle_bps），scenario 的 ws stall 作为盘口停顿；统计从事件发生到假交易所上挂单全部撤掉的时间。
+    """
+    exchange.reset()
+    st_http.scheduler = RequestScheduler()
+    beg2._should_exit = False
+    beg2.cooldown = Cooldown()
+    beg2.params = ParamStore(BENCH_PARAMS)
+    beg2.watchdog = Watchdog(auth, beg2.book_holder, heartbeat_ms=1500, book_age_ms=2000)
+    beg2.watchdog.session.headers["X-Bench-Source"] = "watchdog"
+    beg2.watchdog.start()
+    supervisor = _BenchSupervisor(auth, beg2.set_book, beg2.position_events, should_exit=lambda: beg2._should_exit,
+                                  cooldown=beg2.cooldown, watchdog=beg2.watchdog)
+
+    def on_message(ws, message):
+        beg2.set_book(supervisor.book_ws.decode(message))
+
+    class _WS:
+        def close(self):
+            pass
+
+    handler = faults.injector.wrap_ws("depth_book", on_message) if faults.injector else on_message
+    stalls = lambda: faults.injector.counts["ws_stalls"] if faults.injector else 0
+    onsets = []   # (kind, monotonic ts, 当时挂着的 cl_ord_id)
+    base_mid = 100000.0
+    mid = base_mid
+    handler(_WS(), _book_frame(mid))
+    strategy = threading.Thread(target=supervisor.run, args=(beg2.main, auth), daemon=True)
+    strategy.start()
+
+    start = time.monotonic()
+    next_move = start + move_every
+    while time.monotonic() - start < duration:
+        now = time.monotonic()
+        kind = None
+        if now >= next_move:
+            next_move = now + move_every
+            mid = base_mid * (1 + move_bps / 10000) if mid == base_mid else base_mid
+            kind = "market move"
+        resting = exchange.snapshot()
+        before = stalls()
+        handler(_WS(), _book_frame(mid))
+        if stalls() != before:
+            onsets.append(("feed stall", now, resting))
+        if kind is not None:
+            onsets.append((kind, now, resting))
+        time.sleep(interval)
+
+    # 让最后一个事件有机会撤完再停
+    time.sleep(3)
+    beg2._should_exit = True
+    beg2.cooldown.wake("exit")
+    strategy.join(30)
+    beg2.watchdog.stop()
+
+    results = {}
+    for kind, onset, resting in onsets:
+        r = results.setdefault(kind, {"exposure": [], "sources": {}, "idle": 0, "unresolved": 0})
+        if not resting:
+            r["idle"] += 1
+            continue
+        seconds, source = exchange.exposure(onset, resting)
+        if seconds is None:
+            r["unresolved"] += 1
+            continue
+        r["exposure"].append(seconds)
+        r["sources"][source] = r["sources"].get(source, 0) + 1
+    lines = []
+    for kind, r in results.items():
+        lines.append(summary(f"{kind} exposure", r["exposure"], r["unresolved"]))
+        lines.append(f"  {'':<22} canceled by {r['sources']}, no orders resting at onset: {r['idle']}")
+    lines.append(f"  {'strategy restarts':<22} {supervisor.restarts}")
+    return lines, results, supervisor.restarts
+
+
+def _report_row(name, kind, r):
+    v = r["exposure"]
+    if not v:
+        return f"| {name} | {kind} | 0 | - | - | - | - | {r['unresolved']} | - |"
+    sources = ", ".join(f"{k} {n}" for k, n in sorted(r["sources"].items()))
+    return (f"| {name} | {kind} | {len(v)} | {pct(v, 0.5) * 1000:.0f} | {pct(v, 0.9) * 1000:.0f} | "
+            f"{pct(v, 0.99) * 1000:.0f} | {max(v) * 1000:.0f} | {r['unresolved']} | {sources} |")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenarios", nargs="*", help="Scenario files; none = baseline without faults")
+    parser.add_argument("--iterations", default=30, type=int)
+    parser.add_argument("--feed_seconds", default=10, type=float)
+    parser.add_argument("--reaction_seconds", default=60, type=float, help="Seconds of strategy-loop reaction bench per scenario (0 = skip)")
+    parser.add_argument("--baseline", action="store_true", help="Also run without faults before the scenarios")
+    parser.add_argument("--report", default="", type=str, help="Write a markdown table of the reaction bench to this file")
+    args = parser.parse_args()
+
+    server = start_fake_exchange()
+    st_http.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    auth = {'access_token': "bench", 'signing_key': SigningKey.generate()}
+
+    rows = []
+    output = []
+
+    def emit(line):
+        print(line)
+        output.append(line)
+
+    paths = ([None] if args.baseline or not args.scenarios else []) + args.scenarios
+    for path in paths:
+        if path is None:
+            faults.clear()
+            name = "baseline"
+        else:
+            name = faults.load_scenario(path).name
+        emit(f"scenario: {name}")
+        st_http.scheduler = RequestScheduler()
+        for line in bench_orders(auth, args.iterations) + bench_feed(args.feed_seconds):
+            emit(line)
+        if args.reaction_seconds:
+            lines, results, restarts = bench_reaction(auth, args.reaction_seconds)
+            for line in lines:
+                emit(line)
+            rows += [_report_row(name, kind, r) for kind, r in results.items()]
+        if faults.injector is not None:
+            emit(f"  injected: {faults.injector.counts}")
+        sys.stdout.flush()
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write("# fault_bench 报告\n\n")
+            f.write(f"`python {' '.join(sys.argv)}`\n\n")
+            f.write("策略反应：事件发生 -> 假交易所上当时挂着的订单全部撤掉（ms）。\n\n")
+            f.write("| scenario | onset | n | p50 ms | p90 ms | p99 ms | max ms | not canceled | canceled by |\n")
+            f.write("|---|---|---|---|---|---|---|---|---|\n")
+            f.write("\n".join(rows) + "\n\n")
+            f.write("完整输出：\n\n```\n" + "\n".join(output) + "\n```\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+故障/延迟注入：在 request_with_retry 和 StandXWSBase 下面按 scenario 文件注入
+延迟分布、断连、5xx/429、WS 帧延迟/丢帧/停顿/断线，用来测策略在恶劣链路下的反应。
+
+未加载 scenario 时 injector 为 None，调用方只多一次 `is not None` 判断。
+
+scenario 格式（JSON）：
+{
+  "name": "rest_p99_2s",
+  "seed": 1,
+  "http": [
+    {"match": "/api/new_order",
+     "latency": {"dist": "lognormal", "p50": 0.05, "p99": 2.0},
+     "drop_rate": 0.01,
+     "status": {"503": 0.02, "429": 0.01},
+     "retry_after": 1}
+  ],
+  "ws": [
+    {"feed": "depth_book",
+     "delay": {"dist": "uniform", "min": 0, "max": 0.2},
+     "drop_rate": 0.05,
+     "stall": {"every": 60, "duration": 5},
+     "disconnect_every": 300}
+  ]
+}
+latency/delay 的 dist 支持 fixed(value) / uniform(min,max) / lognormal(p50,p99) / replay(samples 或 file)。
+"""
+import json
+import math
+import time
+import random
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+injector = None
+
+
+class LatencyDist:
+    def __init__(self, spec, rng):
+        self.rng = rng
+        self.dist = spec.get("dist", "fixed")
+        if self.dist == "fixed":
+            self.value = float(spec.get("value", 0))
+        elif self.dist == "uniform":
+            self.lo = float(spec.get("min", 0))
+            self.hi = float(spec.get("max", 0))
+        elif self.dist == "lognormal":
+            p50 = float(spec["p50"])
+            p99 = float(spec["p99"])
+            self.mu = math.log(p50)
+            # z(0.99) = 2.326
+            self.sigma = max(0.0, math.log(p99 / p50) / 2.326)
+        elif self.dist == "replay":
+            samples = spec.get("samples")
+            if samples is None:
+                with open(spec["file"], "r") as f:
+                    samples = [float(line) for line in f if line.strip()]
+            self.samples = [float(x) for x in samples]
+        else:
+            raise ValueError(f"unknown latency dist: {self.dist}")
+
+    def sample(self):
+        if self.dist == "fixed":
+            return self.value
+        if self.dist == "uniform":
+            return self.rng.uniform(self.lo, self.hi)
+        if self.dist == "lognormal":
+            return self.rng.lognormvariate(self.mu, self.sigma)
+        return self.rng.choice(self.samples)
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class HttpRule:
+    def __init__(self, spec, rng):
+        self.rng = rng
+        self.match = spec.get("match", "")
+        self.latency = LatencyDist(spec["latency"], rng) if "latency" in spec else None
+        self.drop_rate = float(spec.get("drop_rate", 0))
+        self.status = {int(k): float(v) for k, v in spec.get("status", {}).items()}
+        self.retry_after = spec.get("retry_after")
+
+
+class WsRule:
+    def __init__(self, spec, rng):
+        self.rng = rng
+        self.feed = spec.get("feed", "")
+        self.delay = LatencyDist(spec["delay"], rng) if "delay" in spec else None
+        self.drop_rate = float(spec.get("drop_rate", 0))
+        stall = spec.get("stall") or {}
+        self.stall_every = float(stall.get("every", 0))
+        self.stall_duration = float(stall.get("duration", 0))
+        self.disconnect_every = float(spec.get("disconnect_every", 0))
+
+
+class FaultInjector:
+    def __init__(self, scenario):
+        self.name = scenario.get("name", "unnamed")
+        self.rng = random.Random(scenario.get("seed"))
+        self.http_rules = [HttpRule(r, self.rng) for r in scenario.get("http", [])]
+        self.ws_rules = [WsRule(r, self.rng) for r in scenario.get("ws", [])]
+        self.counts = {"http_delayed": 0, "http_dropped": 0, "http_status": 0, "ws_delayed": 0, "ws_dropped": 0, "ws_stalls": 0, "ws_disconnects": 0}
+
+    def _http_rule(self, url):
+        for rule in self.http_rules:
+            if rule.match in url:
+                return rule
+        return None
+
+    def http(self, method, url, timeout=None):
+        """
+        请求发出前调用：按规则 sleep 注入延迟；返回 FakeResponse 表示直接用假响应，
+        返回 None 表示继续真实请求；断连/超时以 requests 的异常抛出。
+        """
+        rule = self._http_rule(url)
+        if rule is None:
+            return None
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if rule.latency is not None:
+            delay = rule.latency.sample()
+            self.counts["http_delayed"] += 1
+            if read_timeout is not None and delay > read_timeout:
+                time.sleep(read_timeout)
+                raise requests.exceptions.ReadTimeout(f"injected timeout after {read_timeout}s ({method} {url})")
+            time.sleep(delay)
+        if rule.drop_rate and self.rng.random() < rule.drop_rate:
+            self.counts["http_dropped"] += 1
+            raise requests.exceptions.ConnectionError(f"injected connection drop ({method} {url})")
+        for status, p in rule.status.items():
+            if self.rng.random() < p:
+                self.counts["http_status"] += 1
+                headers = {}
+                if status == 429 and rule.retry_after is not None:
+                    headers["Retry-After"] = str(rule.retry_after)
+                return FakeResponse(status, f"injected {status}", headers)
+        return None
+
+    def _ws_rule(self, feed):
+        for rule in self.ws_rules:
+            if rule.feed == feed:
+                return rule
+        return None
+
+    def wrap_ws(self, feed, on_message):
+        """包装 WS 的 on_message 回调，按规则延迟/丢弃/停顿/断开。"""
+        rule = self._ws_rule(feed)
+        if rule is None:
+            return on_message
+        opened = time.monotonic()
+        state = {"next_stall": opened + rule.stall_every if rule.stall_every else None}
+
+        def _wrapped(ws, message):
+            now = time.monotonic()
+            if rule.disconnect_every and now - opened > rule.disconnect_every:
+                self.counts["ws_disconnects"] += 1
+                logger.info(f"[faults] injected {feed} disconnect")
+                ws.close()
+                return
+            if state["next_stall"] is not None and now >= state["next_stall"]:
+                self.counts["ws_stalls"] += 1
+                logger.info(f"[faults] injected {feed} stall {rule.stall_duration}s")
+                time.sleep(rule.stall_duration)
+                state["next_stall"] = time.monotonic() + rule.stall_every
+            if rule.drop_rate and self.rng.random() < rule.drop_rate:
+                self.counts["ws_dropped"] += 1
+                return
+            if rule.delay is not None:
+                self.counts["ws_delayed"] += 1
+                time.sleep(rule.delay.sample())
+            on_message(ws, message)
+
+        return _wrapped
+
+
+def load_scenario(path):
+    global injector
+    with open(path, "r") as f:
+        scenario = json.load(f)
+    injector = FaultInjector(scenario)
+    logger.info(f"[faults] scenario {injector.name} loaded from {path}")
+    return injector
+
+
+def clear():
+    global injector
+    injector = None
@@ -0,0 +1,402 @@
+"""
+独立下单网关进程：持有签名私钥、HTTP 连接和重试逻辑，策略进程通过 UNIX socket 用紧凑的二进制协议下单/撤单/查询，
+签名、JSON 编码和 requests I/O 不再和策略进程的 WS 解码、策略逻辑抢 GIL。
+网关只持有一个账户，同一账户的多个策略进程可以共用一个网关；客户端每次连上都用 ping 核对网关的账户。
+
+帧格式（大端）：
+  请求  [u32 body_len][u8 op][u32 req_id][body]
+  响应  [u32 body_len][u8 status][u32 req_id][body]   status: 0=ok 1=error（body 为错误信息）
+字符串为 [u16 len][utf8]，side 为 u8（0=buy 1=sell）。ping 的响应 body 为网关账户标识（auth_store.account_id）。
+
+  python gateway.py --auth standx_beggar_auth.json --socket /tmp/standx_gateway.sock
+  python gateway.py --socket /tmp/standx_gateway.sock --bench 10000
+  python beg2.py --gateway /tmp/standx_gateway.sock ...
+"""
+import os
+import json
+import time
+import struct
+import socket
+import argparse
+import threading
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import st_http
+from auth_store import account_id
+
+logger = logging.getLogger(__name__)
+
+
+HEADER = struct.Struct(">IBI")
+U16 = struct.Struct(">H")
+
+OP_PING = 1
+OP_CREATE = 2
+OP_CANCEL = 3
+OP_QUERY_ORDERS = 4
+OP_QUERY_POSITIONS = 5
+OP_MAKER_CLEAN = 6
+OP_TAKER_CLEAN = 7
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+SIDES = ("buy", "sell")
+
+
+def pack_str(s):
+    b = str(s).encode("utf-8")
+    return U16.pack(len(b)) + b
+
+
+def unpack_str(buf, off):
+    (n,) = U16.unpack_from(buf, off)
+    off += U16.size
+    return buf[off:off + n].decode("utf-8"), off + n
+
+
+def pack_side(side):
+    return bytes((SIDES.index(side),))
+
+
+def recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("gateway socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock):
+    length, code, req_id = HEADER.unpack(recv_exact(sock, HEADER.size))
+    body = recv_exact(sock, length) if length else b""
+    return code, req_id, body
+
+
+def frame(code, req_id, body=b""):
+    return HEADER.pack(len(body), code, req_id) + body
+
+
+# ---------------------------------------------------------------------------
+# server
+# ---------------------------------------------------------------------------
+
+class GatewayServer:
+    def __init__(self, path, auth, workers=32):
+        self.path = path
+        self.auth = auth
+        self.account = account_id(auth)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gateway")
+        self._sock = None
+        self._conns = set()
+        self._conns_lock = threading.Lock()
+
+    def listen(self):
+        if os.path.exists(self.path):
+            # 还能连上说明另一个网关正在用这个 socket，不能把它顶掉；连不上才是崩溃留下的残留文件
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"gateway socket {self.path} is in use by another process")
+            finally:
+                probe.close()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._sock.listen(16)
+        logger.info(f"gateway listening on {self.path}, account {self.account}")
+
+    def serve_forever(self):
+        if self._sock is None:
+            self.listen()
+        sock = self._sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                # close() 关掉了监听 socket
+                break
+            threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+
+    def close(self):
+        """停止监听并断开所有客户端连接。"""
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        with self._conns_lock:
+            conns = list(self._conns)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _serve_conn(self, conn):
+        with self._conns_lock:
+            self._conns.add(conn)
+        write_lock = threading.Lock()
+
+        def _reply(code, req_id, body):
+            with write_lock:
+                conn.sendall(frame(code, req_id, body))
+
+        def _run(op, req_id, body):
+            try:
+                result = self._dispatch(op, body)
+                _reply(STATUS_OK, req_id, result)
+            except Exception as e:
+                _reply(STATUS_ERROR, req_id, str(e).encode("utf-8"))
+
+        try:
+            while True:
+                op, req_id, body = read_frame(conn)
+                if op == OP_PING:
+                    _reply(STATUS_OK, req_id, self.account.encode("utf-8"))
+                else:
+                    self._pool.submit(_run, op, req_id, body)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._conns_lock:
+                self._conns.discard(conn)
+            conn.close()
+
+    def _dispatch(self, op, body):
+        auth = self.auth
+        if op in (OP_CREATE, OP_MAKER_CLEAN):
+            side = SIDES[body[0]]
+            price, off = unpack_str(body, 1)
+            qty, off = unpack_str(body, off)
+            cl_ord_id, off = unpack_str(body, off)
+            fn = st_http.create_order if op == OP_CREATE else st_http.maker_clean_position
+            return fn(auth, price, qty, side, cl_ord_id=cl_ord_id or None).encode("utf-8")
+        if op == OP_CANCEL:
+            (count,) = U16.unpack_from(body, 0)
+            off = U16.size
+            ids = []
+            for _ in range(count):
+                cl_ord_id, off = unpack_str(body, off)
+                ids.append(cl_ord_id)
+            return json.dumps(st_http.cancel_orders(auth, ids)).encode("utf-8")
+        if op == OP_QUERY_ORDERS:
+            return json.dumps(st_http.query_orders(auth)).encode("utf-8")
+        if op == OP_QUERY_POSITIONS:
+            return json.dumps(st_http.query_positions(auth)).encode("utf-8")
+        if op == OP_TAKER_CLEAN:
+            side = SIDES[body[0]]
+            qty, _ = unpack_str(body, 1)
+            return json.dumps(st_http.taker_clean_position(auth, qty, side)).encode("utf-8")
+        raise ValueError(f"unknown op {op}")
+
+
+# ---------------------------------------------------------------------------
+# client
+# ---------------------------------------------------------------------------
+
+class _Pending:
+    __slots__ = ("event", "status", "body")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = None
+        self.body = None
+
+
+class GatewayClient:
+    """
+    与 st_http 同名同参的下单/查询接口（auth 参数保留但不使用，签名由网关完成），
+    可以直接替换 common.api。一条连接上可以同时有多个请求在途，按 req_id 匹配响应。
+
+    构造时传入 auth 的话，每次（重）连都先 ping 一次核对网关的账户，和自己的不一致时抛 RuntimeError，
+    避免策略用 A 账户启动、实际却在网关加载的 B 账户上下单。
+
+    连接断开（网关重启）时，在途请求以错误返回；下一次 call() 自动重连并启动新的读线程。
+    发送时就发现连接已断的请求重连后重发一次；已发出但没等到响应的请求不重发（不知道网关是否已执行）。
+    """
+
+    def __init__(self, path, timeout=30, auth=None):
+        self.path = path
+        self.timeout = timeout
+        self.expected_account = account_id(auth) if auth is not None else None
+        self.account = None
+        self.reconnects = 0
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._sock = None
+        self._pending = None
+        with self._write_lock:
+            self._connect()
+
+    def _connect(self):
+        """调用方持有 _write_lock。每条连接有自己的 pending 表和读线程。"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            # 读线程启动前同步握手，req_id 0 不会和 call() 的请求冲突
+            sock.settimeout(self.timeout)
+            sock.sendall(frame(OP_PING, 0))
+            _, _, body = read_frame(sock)
+            sock.settimeout(None)
+        except OSError:
+            sock.close()
+            raise
+        account = body.decode("utf-8", "replace")
+        if self.expected_account is not None and account != self.expected_account:
+            sock.close()
+            raise RuntimeError(f"gateway {self.path} trades account {account or '<unknown>'}, this process uses {self.expected_account}")
+        self.account = account
+        pending = {}
+        threading.Thread(target=self._read_loop, args=(sock, pending), name="gateway-client", daemon=True).start()
+        self._sock = sock
+        self._pending = pending
+
+    def _drop(self, sock):
+        """调用方持有 _write_lock：sock 仍是当前连接时丢掉它，下一次 call() 重连。"""
+        if self._sock is sock:
+            self._sock = None
+            self._pending = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _read_loop(self, sock, pending):
+        try:
+            while True:
+                status, req_id, body = read_frame(sock)
+                p = pending.pop(req_id, None)
+                if p is not None:
+                    p.status = status
+                    p.body = body
+                    p.event.set()
+        except (ConnectionError, OSError) as e:
+            logger.info(f"gateway connection lost: {e}")
+        with self._write_lock:
+            self._drop(sock)
+        for req_id in list(pending):
+            p = pending.pop(req_id, None)
+            if p is not None:
+                p.status = STATUS_ERROR
+                p.body = b"gateway connection lost"
+                p.event.set()
+
+    def call(self, op, body=b""):
+        req_id = next(self._ids) & 0xFFFFFFFF
+        p = _Pending()
+        data = frame(op, req_id, body)
+        with self._write_lock:
+            for attempt in range(2):
+                if self._sock is None:
+                    self._connect()
+                    self.reconnects += 1
+                    logger.info(f"gateway reconnected to {self.path} (#{self.reconnects})")
+                sock, pending = self._sock, self._pending
+                pending[req_id] = p
+                try:
+                    sock.sendall(data)
+                    break
+                except OSError as e:
+                    pending.pop(req_id, None)
+                    self._drop(sock)
+                    if attempt:
+                        raise
+                    logger.info(f"gateway send failed, reconnecting: {e}")
+        if not p.event.wait(self.timeout):
+            pending.pop(req_id, None)
+            raise TimeoutError(f"gateway op {op} timed out")
+        if p.status != STATUS_OK:
+            raise Exception(p.body.decode("utf-8", "replace"))
+        return p.body
+
+    def ping(self):
+        t0 = time.perf_counter()
+        self.call(OP_PING)
+        return time.perf_counter() - t0
+
+    def create_order(self, auth, price, qty, side, cl_ord_id=None):
+        body = pack_side(side) + pack_str(price) + pack_str(qty) + pack_str(cl_ord_id or "")
+        return self.call(OP_CREATE, body).decode("utf-8")
+
+    def maker_clean_position(self, auth, price, qty, side, cl_ord_id=None):
+        body = pack_side(side) + pack_str(price) + pack_str(qty) + pack_str(cl_ord_id or "")
+        return self.call(OP_MAKER_CLEAN, body).decode("utf-8")
+
+    def taker_clean_position(self, auth, qty, side):
+        return json.loads(self.call(OP_TAKER_CLEAN, pack_side(side) + pack_str(qty)))
+
+    def cancel_orders(self, auth, cl_ord_ids):
+        if not cl_ord_ids:
+            return
+        body = U16.pack(len(cl_ord_ids)) + b"".join(pack_str(i) for i in cl_ord_ids)
+        return json.loads(self.call(OP_CANCEL, body))
+
+    def query_orders(self, auth):
+        return json.loads(self.call(OP_QUERY_ORDERS))
+
+    def query_positions(self, auth):
+        return json.loads(self.call(OP_QUERY_POSITIONS))
+
+    def close(self):
+        with self._write_lock:
+            if self._sock is not None:
+                self._drop(self._sock)
+
+
+def bench(path, n):
+    client = GatewayClient(path)
+    for _ in range(100):
+        client.ping()
+    rtts = sorted(client.ping() for _ in range(n))
+    print(
+        f"ping x{n}: p50={rtts[n // 2] * 1e6:.1f}us p99={rtts[int(n * 0.99)] * 1e6:.1f}us "
+        f"max={rtts[-1] * 1e6:.1f}us"
+    )
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--auth", default="standx_beggar_auth.json", type=str, help="Path to auth json file or auth store")
+    parser.add_argument("--account", default="", type=str, help="Account name when --auth is a multi-account auth store")
+    parser.add_argument("--socket", default="/tmp/standx_gateway.sock", type=str)
+    parser.add_argument("--bench", default=0, type=int, help="Measure IPC round trip with N pings against a running gateway")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.socket, args.bench)
+        return
+
+    from logconf import setup_logging
+    from auth_store import load_auth, AuthWatcher
+    setup_logging()
+    auth = load_auth(args.auth, args.account or None)
+    watcher = AuthWatcher(args.auth, args.account or None)
+
+    def _reload_auth():
+        # token 轮换后原地更新，正在进行的请求不受影响
+        while True:
+            time.sleep(watcher.interval)
+            new_auth = watcher.poll()
+            if new_auth is not None:
+                auth.update(new_auth)
+
+    threading.Thread(target=_reload_auth, name="auth-reload", daemon=True).start()
+    st_http.start_keep_warm()
+    GatewayServer(args.socket, auth).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,38 @@
+"""
+单账户（原流程）：读环境变量 STANDX_BEGGAR_ADDR / STANDX_BEGGAR_PK，写 standx_beggar_auth.json
+  python gen_auth.py
+
+多账户：钱包列表并发登录（最多 --workers 个同时进行），写按账户名索引的 auth store（auth_store.py），
+记录每个 token 的过期时间；--refresh 只轮换 --ahead_days 内过期的账户，--loop 常驻定期轮换。
+运行中的 beg2 / gateway 会在文件被替换后自动重新加载 token。
+  python gen_auth.py --wallets wallets.json --store auth_store.json --workers 8
+  python gen_auth.py --wallets wallets.json --store auth_store.json --refresh --ahead_days 7 --loop 3600
+
+wallets.json：[{"name": "acct1", "address": "0x...", "pk_env": "ACCT1_PK"}, ...]
+（私钥优先从 pk_env 指定的环境变量读取，也可以直接写 "pk"）
+"""
 import os
 import json
+import time
+import argparse
 import requests
 import base58
 import base64
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from nacl.signing import SigningKey
 
+from auth_store import AuthStore, token_expiry
+
 from eth_account import Account
 from eth_account.messages import encode_defunct
 
 
 
+DEFAULT_EXPIRES_SECONDS = 86400 * 365
+
+
 def gen_auth():
     addr = os.getenv("STANDX_BEGGAR_ADDR")
     if not addr:
@@ -20,7 +43,11 @@ def gen_auth():
         raise ValueError("STANDX_BEGGAR_PK environment variable is not set.")
 
     print("Generating gen_token...")
+    return sign_in(addr, pk)
 
+
+def sign_in(addr, pk, session=requests, expires_seconds=DEFAULT_EXPIRES_SECONDS, log=print):
+    """prepare-signin -> 钱包签名 -> login，返回 {'access_token', 'signing_key'}。"""
     # ------------------------------------------------------------
     # Step 1: requestId
     # ------------------------------------------------------------
@@ -28,14 +55,15 @@ def gen_auth():
     
     public_key_bytes = signing_key.verify_key.encode()
     request_id = base58.b58encode(public_key_bytes).decode()
-    print(f"Generated Request ID: {request_id}")
+    log(f"Generated Request ID: {request_id}")
 
     # ------------------------------------------------------------
     # Step 2: prepare-signin
     # ------------------------------------------------------------
-    resp = requests.post(
+    resp = session.post(
         "https://api.standx.com/v1/offchain/prepare-signin?chain=bsc",
         headers={"Content-Type": "application/json"},
+        timeout=30,
         json={
             "address": addr,
             "requestId": request_id,
@@ -49,7 +77,7 @@ def gen_auth():
     if not signed_data:
         raise Exception("No signedData in response")
 
-    print(f"Received signedData: {signed_data[:10]}...")
+    log(f"Received signedData: {signed_data[:10]}...")
 
     # ------------------------------------------------------------
     # Step 4: sign message with wallet private key
@@ -58,26 +86,27 @@ def gen_auth():
     payload_b64 += "=" * (-len(payload_b64) % 4)
     payload_json = json.loads(base64.urlsafe_b64decode(payload_b64).decode("utf-8"))
     message = payload_json["message"]
-    print('-----------------Message to sign-----------------------')
-    print(message)
-    print('-------------------------------------------------------')
+    log('-----------------Message to sign-----------------------')
+    log(message)
+    log('-------------------------------------------------------')
 
     acct = Account.from_key(pk)
     signed_msg = acct.sign_message(encode_defunct(text=message))
     wallet_signature = "0x" + signed_msg.signature.hex()
 
-    print(f"Wallet signature: {wallet_signature[:10]}...")
+    log(f"Wallet signature: {wallet_signature[:10]}...")
 
     # ------------------------------------------------------------
     # Step 5: login -> access token
     # ------------------------------------------------------------
-    login_resp = requests.post(
+    login_resp = session.post(
         "https://api.standx.com/v1/offchain/login?chain=bsc",
         headers={"Content-Type": "application/json"},
+        timeout=30,
         json={
             "signature": wallet_signature,
             "signedData": signed_data,
-            "expiresSeconds": 86400 * 365,
+            "expiresSeconds": expires_seconds,
         },
     )
 
@@ -89,9 +118,9 @@ def gen_auth():
     if not token:
         raise Exception("No token in login response", login_data)
 
-    print("Access token received")
-    print(f"Address: {login_data.get('address')}")
-    print(f"Chain: {login_data.get('chain')}")
+    log("Access token received")
+    log(f"Address: {login_data.get('address')}")
+    log(f"Chain: {login_data.get('chain')}")
     return {
         'access_token': token,
         'signing_key': signing_key,
@@ -99,14 +128,116 @@ def gen_auth():
 
 
 
+def load_wallets(path):
+    with open(path, "r", encoding="utf-8") as f:
+        wallets = json.load(f)
+    names = [w["name"] for w in wallets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate wallet names in {path}")
+    return wallets
+
+
+def wallet_pk(wallet):
+    if wallet.get("pk_env"):
+        pk = os.getenv(wallet["pk_env"])
+        if not pk:
+            raise ValueError(f"{wallet['pk_env']} environment variable is not set.")
+        return pk
+    if wallet.get("pk"):
+        return wallet["pk"]
+    raise ValueError(f"wallet {wallet['name']} has neither pk_env nor pk")
+
+
+def _sign_in_wallet(wallet, session, expires_seconds):
+    issued_at = time.time()
+    auth = sign_in(wallet["address"], wallet_pk(wallet), session=session, expires_seconds=expires_seconds, log=lambda msg: None)
+    expires_at = token_expiry(auth['access_token']) or issued_at + expires_seconds
+    return auth, issued_at, expires_at
+
+
+def provision(wallets, store, workers=8, expires_seconds=DEFAULT_EXPIRES_SECONDS):
+    """
+    并发登录 wallets（最多 workers 个同时进行），每成功一个就原子写一次 store，
+    中途失败或被打断时已完成的账户不会丢。返回失败的账户名。
+    """
+    if not wallets:
+        return []
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_maxsize=workers))
+    failed = []
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="signin") as pool:
+        futures = {pool.submit(_sign_in_wallet, w, session, expires_seconds): w for w in wallets}
+        for f in as_completed(futures):
+            wallet = futures[f]
+            try:
+                auth, issued_at, expires_at = f.result()
+            except Exception as e:
+                print(f"[{wallet['name']}] sign-in failed: {e}")
+                failed.append(wallet["name"])
+                continue
+            store.put(
+                wallet["name"],
+                wallet["address"],
+                auth['access_token'],
+                auth['signing_key'].encode().hex(),
+                issued_at,
+                expires_at,
+            )
+            store.save()
+            print(f"[{wallet['name']}] token saved, expires {datetime.fromtimestamp(expires_at).isoformat(timespec='seconds')}")
+    print(f"provisioned {len(wallets) - len(failed)}/{len(wallets)} accounts in {time.time() - t0:.1f}s -> {store.path}")
+    return failed
+
+
+def refresh(wallets, store, ahead_seconds, workers=8, expires_seconds=DEFAULT_EXPIRES_SECONDS):
+    """只轮换 ahead_seconds 内过期、或者 store 里还没有的账户。"""
+    due = set(store.due(ahead_seconds))
+    targets = [w for w in wallets if w["name"] in due or w["name"] not in store.accounts]
+    if not targets:
+        print("no tokens due for rotation")
+        return []
+    print(f"rotating {len(targets)} tokens: {[w['name'] for w in targets]}")
+    return provision(targets, store, workers, expires_seconds)
+
+
 def main():
-    auth = gen_auth()
-    with open("standx_beggar_auth.json", "w") as f:
-        json.dump({
-            'access_token': auth['access_token'],
-            'signing_key': auth['signing_key'].encode().hex(),
-        }, f)
-    print("Authentication data saved to standx_beggar_auth.json")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wallets", default="", type=str, help="Wallet list for fleet provisioning ('' = single account from env vars)")
+    parser.add_argument("--store", default="auth_store.json", type=str, help="Indexed auth store written in fleet mode")
+    parser.add_argument("--workers", default=8, type=int, help="Concurrent sign-in flows")
+    parser.add_argument("--expires_days", default=365, type=float, help="Requested token lifetime")
+    parser.add_argument("--refresh", action="store_true", help="Only rotate tokens expiring within --ahead_days")
+    parser.add_argument("--ahead_days", default=7, type=float, help="Rotate tokens this long before they expire")
+    parser.add_argument("--loop", default=0, type=float, help="With --refresh, keep running and check every N seconds")
+    args = parser.parse_args()
+
+    if not args.wallets:
+        auth = gen_auth()
+        with open("standx_beggar_auth.json", "w") as f:
+            json.dump({
+                'access_token': auth['access_token'],
+                'signing_key': auth['signing_key'].encode().hex(),
+            }, f)
+        print("Authentication data saved to standx_beggar_auth.json")
+        return
+
+    wallets = load_wallets(args.wallets)
+    store = AuthStore(args.store)
+    expires_seconds = int(args.expires_days * 86400)
+    if not args.refresh:
+        failed = provision(wallets, store, args.workers, expires_seconds)
+        if failed:
+            raise SystemExit(f"sign-in failed for: {failed}")
+        return
+    while True:
+        failed = refresh(wallets, store, args.ahead_days * 86400, args.workers, expires_seconds)
+        if not args.loop:
+            if failed:
+                raise SystemExit(f"sign-in failed for: {failed}")
+            return
+        # 失败的账户留在 due 列表里，下一轮再试
+        time.sleep(args.loop)
 
 
 if __name__ == "__main__":
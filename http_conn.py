@@ -0,0 +1,242 @@
+"""
+交易 HTTP 连接层：
+  - TunedAdapter：连接池按并发下单数配置，socket 打开 TCP_NODELAY 和 TCP keepalive
+  - DnsCache：域名预解析并缓存，新建连接时直接连缓存的 IP（TLS 的 SNI / 证书校验仍用原域名），
+    后台定期刷新，下单路径上不再做 DNS 查询；连接失败时丢弃该缓存项
+  - KeepWarm：连接空闲超过 idle 秒时并发发几个轻量 GET，保持池里的 keep-alive 连接，
+    长时间冷却之后的第一笔 create_order 不用重新握手
+  - 统计请求数、新建连接（握手）数、握手耗时，算出连接复用率
+"""
+import time
+import socket
+import threading
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+
+import metrics
+from latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = metrics.counter("beggar_http_requests_total", "HTTP requests sent through tuned sessions")
+HTTP_HANDSHAKES = metrics.counter("beggar_http_handshakes_total", "New HTTPS connections (TCP + TLS handshakes)")
+HTTP_HANDSHAKE_SECONDS = metrics.gauge("beggar_http_handshake_seconds", "TCP + TLS handshake time percentiles", ("quantile",))
+HTTP_REUSE_RATIO = metrics.gauge("beggar_http_connection_reuse_ratio", "Share of requests served on an existing connection")
+
+
+def _socket_options():
+    options = list(HTTPConnection.default_socket_options)  # 已包含 TCP_NODELAY
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Linux / macOS 上把 keepalive 探测调到秒级，及时发现被中间设备掐断的空闲连接
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPALIVE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+SOCKET_OPTIONS = _socket_options()
+
+
+class DnsCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}   # host -> (ip, expires_at)
+        self._lock = threading.Lock()
+
+    def _resolve(self, host):
+        infos = socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+        # 优先 IPv4
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        ip = infos[0][4][0]
+        with self._lock:
+            self._entries[host] = (ip, time.monotonic() + self.ttl)
+        return ip
+
+    def lookup(self, host):
+        entry = self._entries.get(host)
+        if entry is not None:
+            # 过期的缓存照样先用，由 refresh() 在后台更新
+            return entry[0]
+        try:
+            return self._resolve(host)
+        except OSError as e:
+            logger.info(f"dns resolve {host} failed: {e}")
+            return host
+
+    def prefetch(self, host):
+        try:
+            ip = self._resolve(host)
+            logger.info(f"dns prefetched {host} -> {ip}")
+        except OSError as e:
+            logger.info(f"dns prefetch {host} failed: {e}")
+
+    def refresh(self):
+        now = time.monotonic()
+        for host, (_, expires_at) in list(self._entries.items()):
+            if expires_at <= now:
+                try:
+                    self._resolve(host)
+                except OSError as e:
+                    logger.info(f"dns refresh {host} failed, keeping cached address: {e}")
+
+    def invalidate(self, host):
+        with self._lock:
+            self._entries.pop(host, None)
+
+
+dns_cache = DnsCache()
+handshake_latency = LatencyTracker(256)
+
+
+class _TunedHTTPSConnection(HTTPSConnection):
+    # 默认用模块级的缓存和统计；TunedAdapter 传入独立实例时按 adapter 派生子类覆盖
+    dns_cache = dns_cache
+    handshake_latency = handshake_latency
+
+    def _new_conn(self):
+        # 只替换 TCP 连接的目标地址；host（SNI、证书校验、Host 头）不变
+        host = self._dns_host
+        self._dns_host = self.dns_cache.lookup(host)
+        try:
+            return super()._new_conn()
+        except Exception:
+            self.dns_cache.invalidate(host)
+            raise
+        finally:
+            self._dns_host = host
+
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        self.handshake_latency.record(time.perf_counter() - t0)
+        HTTP_HANDSHAKES.inc()
+
+
+class _TunedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TunedHTTPSConnection
+
+
+class TunedAdapter(HTTPAdapter):
+    def __init__(self, *args, dns=None, handshakes=None, **kwargs):
+        self.last_used = 0.0
+        self._pool_cls = _TunedHTTPSConnectionPool
+        if dns is not None or handshakes is not None:
+            conn_cls = type("_TunedHTTPSConnection", (_TunedHTTPSConnection,), {
+                "dns_cache": dns if dns is not None else dns_cache,
+                "handshake_latency": handshakes if handshakes is not None else handshake_latency,
+            })
+            self._pool_cls = type("_TunedHTTPSConnectionPool", (_TunedHTTPSConnectionPool,), {"ConnectionCls": conn_cls})
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs["socket_options"] = SOCKET_OPTIONS
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme, https=self._pool_cls)
+
+    def send(self, request, *args, **kwargs):
+        self.last_used = time.monotonic()
+        HTTP_REQUESTS.inc()
+        return super().send(request, *args, **kwargs)
+
+
+def new_session(pool_maxsize, pool_connections=4, dns=None, handshakes=None):
+    """dns / handshakes 传入独立的 DnsCache / LatencyTracker 时，不和模块级的共用缓存和锁。"""
+    session = requests.Session()
+    session.mount("https://", TunedAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                           dns=dns, handshakes=handshakes))
+    return session
+
+
+def stats():
+    requests_n = HTTP_REQUESTS.value()
+    handshakes = HTTP_HANDSHAKES.value()
+    return {
+        "requests": requests_n,
+        "handshakes": handshakes,
+        "reuse_ratio": round(1 - handshakes / requests_n, 4) if requests_n else None,
+        "handshake_p50_ms": _ms(handshake_latency.percentile(0.5)),
+        "handshake_p99_ms": _ms(handshake_latency.percentile(0.99)),
+    }
+
+
+def _ms(v):
+    return None if v is None else round(v * 1000, 1)
+
+
+def _reuse_ratio():
+    requests_n = HTTP_REQUESTS.value()
+    return 1 - HTTP_HANDSHAKES.value() / requests_n if requests_n else float("nan")
+
+
+HTTP_REUSE_RATIO.set_function(_reuse_ratio)
+for _q in (0.5, 0.99):
+    HTTP_HANDSHAKE_SECONDS.labels(quantile=_q).set_function(lambda q=_q: handshake_latency.percentile(q) or float("nan"))
+
+
+class KeepWarm:
+    """
+    后台线程：会话空闲超过 idle 秒时并发发 connections 个 GET，保持这么多条 keep-alive 连接；
+    顺带刷新 DNS 缓存、定期打印连接统计。before_request 用来先拿限流令牌。
+    并发的 GET 由 start() 时建好的常驻线程池发出，不再每次 ping 新建线程。
+    """
+
+    def __init__(self, session, url, params=None, idle=15, connections=2, interval=5,
+                 stats_interval=300, before_request=None):
+        self.session = session
+        self.adapter = session.get_adapter(url)
+        self.url = url
+        self.params = params
+        self.idle = idle
+        self.connections = connections
+        self.interval = interval
+        self.stats_interval = stats_interval
+        self.before_request = before_request
+        self.pings = 0
+        self._stop = False
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="keep-warm-ping")
+        self._thread = threading.Thread(target=self._run, name="keep-warm", daemon=True)
+        self._thread.start()
+        logger.info(f"keep-warm started: idle={self.idle}s connections={self.connections}")
+        return self._thread
+
+    def stop(self):
+        self._stop = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _run(self):
+        # 启动时先把连接建好，第一笔下单不用握手
+        self.ping()
+        last_stats = time.monotonic()
+        while not self._stop:
+            time.sleep(self.interval)
+            if self._stop:
+                break
+            dns_cache.refresh()
+            now = time.monotonic()
+            if now - self.adapter.last_used >= self.idle:
+                self.ping()
+            if now - last_stats > self.stats_interval:
+                last_stats = now
+                logger.info(f"http connections: {stats()}")
+
+    def ping(self):
+        futures = [self._pool.submit(self._ping_one) for _ in range(self.connections)]
+        wait(futures, timeout=5)
+        self.pings += 1
+
+    def _ping_one(self):
+        try:
+            if self.before_request is not None:
+                self.before_request()
+            self.session.get(self.url, params=self.params, timeout=(1, 2))
+        except Exception as e:
+            logger.info(f"keep-warm ping failed: {e!r}")
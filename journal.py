@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import fcntl
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class JournalState:
+    """journal 回放出来的状态：可能还挂着的订单 + 最后一次仓位。"""
+
+    def __init__(self):
+        self.open_orders = {}
+        self.position_qty = 0.0
+
+    def apply(self, event, fields):
+        if event == "intent":
+            self.open_orders[fields["cl_ord_id"]] = {k: fields[k] for k in ("side", "price", "qty") if k in fields}
+        elif event == "reject":
+            self.open_orders.pop(fields["cl_ord_id"], None)
+        elif event == "cancel":
+            for cl_ord_id in fields["cl_ord_ids"]:
+                self.open_orders.pop(cl_ord_id, None)
+        elif event == "clean":
+            self.open_orders.clear()
+        elif event == "position":
+            self.position_qty = float(fields.get("qty") or 0)
+        elif event == "snapshot":
+            self.open_orders = dict(fields.get("open_orders", {}))
+            self.position_qty = float(fields.get("position_qty") or 0)
+
+    def snapshot(self):
+        return {"open_orders": dict(self.open_orders), "position_qty": self.position_qty}
+
+
+class Journal:
+    """
+    追加写的订单/仓位日志，用于崩溃后快速恢复。
+
+    record() 只做一次 deque.append 和一次内存状态更新，不碰磁盘、不加锁；
+    后台线程每 fsync_interval 秒把积攒的记录批量写入并 fsync 一次。
+    启动时回放已有文件得到 state（未撤的 cl_ord_id / 最后仓位）。
+    同一个 journal 只能被一个进程打开（path + ".lock" 上的 flock；compact 会替换文件本身，所以不锁它）。
+    """
+
+    def __init__(self, path, fsync_interval=0.05):
+        self.path = path
+        self.fsync_interval = float(fsync_interval)
+        self._lock_file = open(path + ".lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(f"journal {path} is in use by another process")
+        self.state = self.replay(path)
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+        logger.info(f"journal {path}: {len(self.state.open_orders)} open orders, position {self.state.position_qty}")
+
+    @staticmethod
+    def replay(path):
+        state = JournalState()
+        if not os.path.exists(path):
+            return state
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                state.apply(entry.get("event"), entry)
+        return state
+
+    def record(self, event, **fields):
+        self.state.apply(event, fields)
+        fields["event"] = event
+        fields["ts"] = time.time()
+        self._queue.append(fields)
+
+    def _write_pending(self):
+        if not self._queue:
+            return
+        lines = []
+        while True:
+            try:
+                lines.append(json.dumps(self._queue.popleft(), separators=(",", ":")))
+            except IndexError:
+                break
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _run(self):
+        while not self._stop:
+            time.sleep(self.fsync_interval)
+            try:
+                with self._lock:
+                    self._write_pending()
+            except Exception as e:
+                logger.info(f"journal write failed: {e}")
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+
+    def compact(self):
+        """用当前 state 的一条 snapshot 替换整个文件。"""
+        with self._lock:
+            self._write_pending()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                entry = dict(self.state.snapshot(), event="snapshot", ts=time.time())
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._stop = True
+        self._thread.join(timeout=1)
+        self.flush()
+        self._file.close()
+        self._lock_file.close()
@@ -0,0 +1,61 @@
+"""
+N 档挂单阶梯：第 i 档距 mark_price (bps + i * step_bps)，每档名义价值 position。
+levels=1 时与原来的单档双边挂单完全一致。
+每档除了下单用的字符串 price 外还带一个 float 'px'，挂单期间每轮的 bps/深度计算直接用它，不再反复 float()。
+"""
+
+
+def build_ladder(mark_price, position, bps, levels=1, step_bps=1):
+    long_orders = []
+    short_orders = []
+    for level in range(levels):
+        offset = (bps + level * step_bps) / 10000
+        long_price = mark_price * (1 - offset)
+        short_price = mark_price * (1 + offset)
+        long_price_str = format(long_price, ".2f")
+        short_price_str = format(short_price, ".2f")
+        long_orders.append({
+            'price': long_price_str,
+            'px': float(long_price_str),
+            'qty': format(position / long_price, ".4f"),
+            'side': 'buy',
+            'level': level,
+        })
+        short_orders.append({
+            'price': short_price_str,
+            'px': float(short_price_str),
+            'qty': format(position / short_price, ".4f"),
+            'side': 'sell',
+            'level': level,
+        })
+    return long_orders, short_orders
+
+
+def ladder_depths(book_ws, book, long_orders, short_orders):
+    """每档前面（更靠近盘口）的挂单量：买单看 bids >= price，卖单看 asks <= price。"""
+    long_depths = [book_ws.depth_above_price(book, o['px']) for o in long_orders]
+    short_depths = [book_ws.depth_below_price(book, o['px']) for o in short_orders]
+    return long_depths, short_depths
+
+
+def ladder_bps(mark_price, long_orders, short_orders):
+    long_bps = [(mark_price - o['px']) / mark_price * 10000 for o in long_orders]
+    short_bps = [(o['px'] - mark_price) / mark_price * 10000 for o in short_orders]
+    return long_bps, short_bps
+
+
+def bps_in_range(level, bps, min_bps, max_bps, step_bps):
+    """第 level 档的区间整体平移 level * step_bps。"""
+    shift = level * step_bps
+    return min_bps + shift < bps < max_bps + shift
+
+
+def level_in_range(level, bps, depth, min_bps, max_bps, step_bps, min_dep):
+    return bps_in_range(level, bps, min_bps, max_bps, step_bps) and depth >= min_dep
+
+
+def ladder_in_range(orders, bps_list, depths, min_bps, max_bps, step_bps, min_dep):
+    return all(
+        level_in_range(o['level'], b, d, min_bps, max_bps, step_bps, min_dep)
+        for o, b, d in zip(orders, bps_list, depths)
+    )
@@ -0,0 +1,35 @@
+import threading
+
+
+class LatencyTracker:
+    """
+    定长环形缓冲区，记录最近 size 个耗时样本（秒）。
+    record() 是 O(1) 的一次写入；percentile() 对当前窗口排序后取分位数，结果缓存到下一次 record。
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self._buf = [0.0] * size
+        self._n = 0
+        self._sorted = None
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        with self._lock:
+            self._buf[self._n % self.size] = value
+            self._n += 1
+            self._sorted = None
+
+    def __len__(self):
+        return min(self._n, self.size)
+
+    def percentile(self, q):
+        """q 取 0~1；没有样本时返回 None。"""
+        with self._lock:
+            n = min(self._n, self.size)
+            if n == 0:
+                return None
+            s = self._sorted
+            if s is None:
+                s = self._sorted = sorted(self._buf[:n])
+        return s[min(n - 1, int(q * n))]
@@ -0,0 +1,202 @@
+"""
+滚动市场统计：每个 depth_book 帧 O(1) 更新，不回扫历史。
+
+盘口帧先聚合进 tick 秒一个的时间桶（每帧只覆盖当前桶的 mid / 失衡 / 深度），
+桶关闭时把一个样本推进各窗口的定长环形缓冲区，同时维护滚动和、平方和：
+  - vol_bps      窗口内 tick 对数收益的已实现波动率（bps）
+  - drift_bps    窗口内 mid 的累计变化（bps）
+  - imbalance    前 levels 档 (bid_qty - ask_qty) / (bid_qty + ask_qty) 的窗口均值
+  - depth_ratio  当前前 levels 档总深度 / 窗口平均深度，< 1 表示深度在变薄
+统计结果整体作为一个不可变 MarketState 发布（一次赋值），策略线程直接读 state。
+"""
+import math
+import time
+from collections import namedtuple
+
+
+# 秒；Params.stats_window 必须是其中之一
+STATS_WINDOWS = (10, 60, 300)
+
+# 按窗口的指标都是 {window: value}；warm[window] 表示该窗口的环形缓冲区已经填满
+MarketState = namedtuple("MarketState", ["ts", "mid", "imbalance", "depth", "vol_bps", "drift_bps", "imbalance_avg", "depth_ratio", "warm"])
+
+EMPTY_STATE = MarketState(0.0, None, 0.0, 0.0, {}, {}, {}, {}, {})
+
+
+def _add(s, c, x):
+    """Neumaier 补偿求和的一步：返回新的 (和, 补偿项)。"""
+    t = s + x
+    if abs(s) >= abs(x):
+        c += (s - t) + x
+    else:
+        c += (x - t) + s
+    return t, c
+
+
+class RollingSum:
+    """
+    定长环形缓冲区上的滚动和 / 平方和，push 为 O(1)。
+    sum / sumsq 加新减旧会累积浮点误差，所以另外对本圈写入的值做补偿求和（_lap / _lapsq）：
+    绕满一圈时缓冲区里正好是本圈写入的值，直接用它重新锚定，不用回扫缓冲区。
+    """
+
+    __slots__ = ("size", "n", "sum", "sumsq", "_buf", "_i", "_lap", "_lapc", "_lapsq", "_lapsqc")
+
+    def __init__(self, size):
+        self.size = size
+        self.n = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._buf = [0.0] * size
+        self._i = 0
+        self._lap = self._lapc = self._lapsq = self._lapsqc = 0.0
+
+    def _wrap(self):
+        self.sum = self._lap + self._lapc
+        self.sumsq = self._lapsq + self._lapsqc
+        self._lap = self._lapc = self._lapsq = self._lapsqc = 0.0
+        self._i = 0
+
+    def push(self, x):
+        i = self._i
+        if self.n == self.size:
+            old = self._buf[i]
+            self.sum -= old
+            self.sumsq -= old * old
+        else:
+            self.n += 1
+        self._buf[i] = x
+        self.sum += x
+        self.sumsq += x * x
+        self._lap, self._lapc = _add(self._lap, self._lapc, x)
+        self._lapsq, self._lapsqc = _add(self._lapsq, self._lapsqc, x * x)
+        self._i = i + 1
+        if self._i == self.size:
+            self._wrap()
+
+    def push_repeat(self, x, count):
+        """等价于 push(x) 执行 count 次；count 不小于窗口时直接整窗重置，否则按切片批量写入。"""
+        if count <= 0:
+            return
+        size = self.size
+        if count >= size:
+            self._buf = [x] * size
+            self.n = size
+            self.sum = x * size
+            self.sumsq = x * x * size
+            self._i = 0
+            self._lap = self._lapc = self._lapsq = self._lapsqc = 0.0
+            return
+        buf = self._buf
+        while count:
+            i = self._i
+            seg = min(count, size - i)
+            # 未写过的位置是 0.0，减掉也不影响
+            old = buf[i:i + seg]
+            buf[i:i + seg] = [x] * seg
+            self.n = min(size, self.n + seg)
+            self.sum += x * seg - math.fsum(old)
+            self.sumsq += x * x * seg - math.fsum(v * v for v in old)
+            self._lap, self._lapc = _add(self._lap, self._lapc, x * seg)
+            self._lapsq, self._lapsqc = _add(self._lapsq, self._lapsqc, x * x * seg)
+            self._i = i + seg
+            count -= seg
+            if self._i == size:
+                self._wrap()
+
+    def mean(self):
+        return self.sum / self.n if self.n else 0.0
+
+
+class MarketStats:
+    def __init__(self, windows=STATS_WINDOWS, tick=0.1, levels=5):
+        self.windows = tuple(windows)
+        self.tick = tick
+        self.levels = levels
+        self._ret = {w: RollingSum(int(round(w / tick))) for w in self.windows}
+        self._imb = {w: RollingSum(int(round(w / tick))) for w in self.windows}
+        self._depth = {w: RollingSum(int(round(w / tick))) for w in self.windows}
+        self._bucket_end = None
+        self._prev_close = None
+        self._mid = None
+        self._imbalance = 0.0
+        self._depth_now = 0.0
+        self.state = EMPTY_STATE
+
+    def on_book(self, book, now=None):
+        """WS 解码线程每帧调用一次；book 的 asks 升序、bids 降序（StandXBookWS.decode）。"""
+        asks = book["asks"]
+        bids = book["bids"]
+        if not asks or not bids:
+            return
+        now = time.monotonic() if now is None else now
+        if self._bucket_end is None:
+            self._bucket_end = now + self.tick
+        elif now >= self._bucket_end:
+            self._close_buckets(now)
+        self._mid = (asks[0][0] + bids[0][0]) / 2
+        bid_qty = 0.0
+        for _, q in bids[:self.levels]:
+            bid_qty += q
+        ask_qty = 0.0
+        for _, q in asks[:self.levels]:
+            ask_qty += q
+        total = bid_qty + ask_qty
+        self._imbalance = (bid_qty - ask_qty) / total if total else 0.0
+        self._depth_now = total
+
+    def _close_buckets(self, now):
+        # 帧间隔超过一个 tick 时，中间的空桶按“价格不变”补齐；批量写入，空档超过窗口时整窗重置
+        missed = int((now - self._bucket_end) / self.tick) + 1
+        self._bucket_end += missed * self.tick
+        mid = self._mid
+        if mid is None:
+            return
+        ret = math.log(mid / self._prev_close) if self._prev_close else 0.0
+        self._prev_close = mid
+        for w in self.windows:
+            self._ret[w].push(ret)
+            self._ret[w].push_repeat(0.0, missed - 1)
+            self._imb[w].push_repeat(self._imbalance, missed)
+            self._depth[w].push_repeat(self._depth_now, missed)
+        self._publish(time.time())
+
+    def _publish(self, ts):
+        vol, drift, imb, depth_ratio, warm = {}, {}, {}, {}, {}
+        for w in self.windows:
+            r = self._ret[w]
+            warm[w] = r.n == r.size
+            vol[w] = math.sqrt(max(r.sumsq, 0.0)) * 10000
+            drift[w] = r.sum * 10000
+            imb[w] = self._imb[w].mean()
+            avg_depth = self._depth[w].mean()
+            depth_ratio[w] = self._depth_now / avg_depth if avg_depth else 1.0
+        self.state = MarketState(ts, self._mid, self._imbalance, self._depth_now, vol, drift, imb, depth_ratio, warm)
+
+
+def quote_adjustment(state, p):
+    """
+    按 Params 把市场状态换算成 (shift_bps, pause_reason)：
+      - vol_k > 0 时，报价距离平移 vol_k * (vol_bps - vol_ref_bps)，限制在 [-min_bps, max_shift_bps]
+      - pause_* > 0 时，对应指标越界就暂停挂单，pause_reason 说明原因
+    统计还没攒满一个窗口时不做任何调整。
+    """
+    w = p.stats_window
+    if not state.warm.get(w):
+        return 0.0, None
+    vol = state.vol_bps[w]
+    shift = 0.0
+    if p.vol_k:
+        shift = min(p.max_shift_bps, max(-p.min_bps, p.vol_k * (vol - p.vol_ref_bps)))
+    drift = state.drift_bps[w]
+    imbalance = state.imbalance_avg[w]
+    depth_ratio = state.depth_ratio[w]
+    if p.pause_vol_bps and vol > p.pause_vol_bps:
+        return shift, f"vol {vol:.1f}bps > {p.pause_vol_bps}"
+    if p.pause_drift_bps and abs(drift) > p.pause_drift_bps:
+        return shift, f"drift {drift:.1f}bps > {p.pause_drift_bps}"
+    if p.pause_imbalance and abs(imbalance) > p.pause_imbalance:
+        return shift, f"imbalance {imbalance:.2f} > {p.pause_imbalance}"
+    if p.pause_depth_ratio and depth_ratio < p.pause_depth_ratio:
+        return shift, f"depth ratio {depth_ratio:.2f} < {p.pause_depth_ratio}"
+    return shift, None
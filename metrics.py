@@ -0,0 +1,190 @@
+"""
+进程内指标注册表，Prometheus text format 输出。
+
+热路径不加锁：
+  - Counter 每个线程各自累加自己的 cell（threading.local），抓取时再求和；
+    只有某线程第一次 inc 时才加锁登记 cell，线程退出时把计数并进 _base 并注销 cell
+  - Gauge.set 只是一次属性赋值
+  - labels(...) 的子指标创建后缓存，之后只是一次 dict 查找
+
+用法：
+  ORDERS = metrics.counter("beggar_orders_total", "orders sent", ("side",))
+  ORDERS.labels(side="buy").inc()
+  metrics.start_http_server(9108)
+"""
+import weakref
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def _fmt_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in zip(labelnames, values))
+    return "{" + inner + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kw):
+        if kw:
+            values = tuple(kw[k] for k in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self.__class__(self.name, self.help)
+                    self._children[values] = child
+        return child
+
+    def samples(self):
+        if self.labelnames:
+            return [(_fmt_labels(self.labelnames, values), child.value()) for values, child in list(self._children.items())]
+        return [("", self.value())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{labels} {value}")
+        return lines
+
+
+class _ThreadHolder:
+    """挂在 threading.local 上，线程退出、local 被清掉时随之回收，触发 Counter._retire。"""
+    __slots__ = ("__weakref__",)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._local = threading.local()
+        self._cells = {}
+        self._base = 0
+
+    def _new_cell(self):
+        cell = [0]
+        holder = _ThreadHolder()
+        with self._lock:
+            self._cells[id(cell)] = cell
+        weakref.finalize(holder, self._retire, cell)
+        self._local.holder = holder
+        self._local.cell = cell
+        return cell
+
+    def _retire(self, cell):
+        # 线程已退出，不会再写这个 cell：计数并进 _base，cell 不再参与求和
+        with self._lock:
+            self._base += cell[0]
+            del self._cells[id(cell)]
+
+    def inc(self, n=1):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[0] += n
+
+    def value(self):
+        with self._lock:
+            return self._base + sum(c[0] for c in self._cells.values())
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._value = 0
+        self._fn = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, fn):
+        """抓取时才调用 fn() 取值，适合 CancelBackoff 惩罚这类现成状态。"""
+        self._fn = fn
+
+    def value(self):
+        if self._fn is not None:
+            try:
+                return self._fn()
+            except Exception:
+                return float("nan")
+        return self._value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labelnames):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, labelnames)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.gauge(name, help, labelnames)
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    t = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    t.start()
+    logger.info(f"metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
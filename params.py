@@ -0,0 +1,108 @@
+import threading
+import logging
+from collections import namedtuple
+
+from market_stats import STATS_WINDOWS
+
+logger = logging.getLogger(__name__)
+
+
+# 策略运行时参数；整体作为一个不可变 namedtuple 发布，策略每次评估前 get() 一次
+Params = namedtuple("Params", [
+    "position",
+    "bps",
+    "max_bps",
+    "min_bps",
+    "throttle_bps",
+    "min_dep",
+    "levels",
+    "level_step_bps",
+    "skip_hour_start",
+    "skip_hour_end",
+    "backoff_base",
+    "backoff_factor",
+    "backoff_window",
+    "backoff_max",
+    # 市场统计（market_stats）驱动的报价调整，vol_k / pause_* 为 0 时关闭
+    "stats_window",
+    "vol_k",
+    "vol_ref_bps",
+    "max_shift_bps",
+    "pause_vol_bps",
+    "pause_drift_bps",
+    "pause_imbalance",
+    "pause_depth_ratio",
+])
+
+_TYPES = {
+    "position": float,
+    "levels": int,
+    "skip_hour_start": int,
+    "skip_hour_end": int,
+    "stats_window": int,
+}
+
+
+def _coerce(name, value):
+    if name == "backoff_max" and value in (None, "", "none", "None"):
+        return None
+    return _TYPES.get(name, float)(value)
+
+
+def validate(p):
+    if p.position <= 0:
+        raise ValueError("position must be > 0")
+    if not 0 <= p.min_bps < p.bps < p.max_bps:
+        raise ValueError("require 0 <= min_bps < bps < max_bps")
+    if p.throttle_bps < p.max_bps:
+        raise ValueError("throttle_bps must be >= max_bps")
+    if p.min_dep < 0:
+        raise ValueError("min_dep must be >= 0")
+    if p.levels < 1 or p.level_step_bps < 0:
+        raise ValueError("levels must be >= 1 and level_step_bps >= 0")
+    if not 0 <= p.skip_hour_start <= p.skip_hour_end <= 24:
+        raise ValueError("require 0 <= skip_hour_start <= skip_hour_end <= 24")
+    if p.backoff_base <= 0 or p.backoff_factor < 1 or p.backoff_window <= 0:
+        raise ValueError("require backoff_base > 0, backoff_factor >= 1, backoff_window > 0")
+    if p.backoff_max is not None and p.backoff_max < p.backoff_base:
+        raise ValueError("backoff_max must be >= backoff_base")
+    if p.stats_window not in STATS_WINDOWS:
+        raise ValueError(f"stats_window must be one of {STATS_WINDOWS}")
+    if min(p.vol_k, p.vol_ref_bps, p.max_shift_bps, p.pause_vol_bps, p.pause_drift_bps, p.pause_imbalance, p.pause_depth_ratio) < 0:
+        raise ValueError("vol_k / vol_ref_bps / max_shift_bps / pause_* must be >= 0")
+
+
+class ParamStore:
+    """
+    get() 无锁，返回当前 Params；update() 校验后整体替换（一次赋值），写日志，
+    下一次评估生效。校验失败时抛 ValueError，旧参数保持不变。
+    """
+
+    def __init__(self, params):
+        validate(params)
+        self._params = params
+        self._lock = threading.Lock()
+
+    def get(self):
+        return self._params
+
+    def update(self, changes):
+        with self._lock:
+            old = self._params
+            unknown = set(changes) - set(Params._fields)
+            if unknown:
+                raise ValueError(f"unknown params: {sorted(unknown)}")
+            new = old._replace(**{k: _coerce(k, v) for k, v in changes.items()})
+            validate(new)
+            self._params = new
+        diff = {k: (getattr(old, k), getattr(new, k)) for k in changes if getattr(old, k) != getattr(new, k)}
+        logger.info(f"params updated: {diff}")
+        return new
+
+
+def apply_backoff(backoff, p):
+    """把 backoff_* 参数同步到 CancelBackoff，保留当前惩罚状态。"""
+    backoff.base = float(p.backoff_base)
+    backoff.factor = float(p.backoff_factor)
+    backoff.window = float(p.backoff_window)
+    backoff.max_seconds = None if p.backoff_max is None else float(p.backoff_max)
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import signal
+import threading
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+# 单独统计耗时的热点函数：(文件名, 函数名)
+FOCUS = (
+    ("beg2.py", "main"),
+    ("st_ws.py", "_on_message"),
+    ("st_ws.py", "_decode_loop"),
+    ("st_ws.py", "decode"),
+    ("common.py", "create_orders"),
+    ("st_http.py", "request_with_retry"),
+)
+
+
+def _frame_label(code):
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    按需开启的采样 profiler：开启后每 interval 秒用 sys._current_frames() 抓一次所有线程的调用栈，
+    持续 window 秒后写出：
+      - <out_dir>/profile-<ts>.folded  flamegraph.pl / speedscope 可直接读取的折叠栈
+      - <out_dir>/profile-<ts>.txt     按函数汇总的 inclusive/self 耗时 + FOCUS 函数耗时
+    未开启时没有采样线程、也不挂任何 hook，开销为零。耗时为墙钟估算（样本数 * 实际采样周期）。
+    """
+
+    def __init__(self, interval=0.005, window=30, out_dir="profiles", focus=FOCUS):
+        self.interval = float(interval)
+        self.window = float(window)
+        self.out_dir = out_dir
+        self.focus = focus
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, window=None):
+        if self.running:
+            logger.info("profiler already running")
+            return False
+        window = self.window if window is None else float(window)
+        self._thread = threading.Thread(target=self._run, args=(window,), name="profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, window):
+        logger.info(f"profiler started: window={window}s interval={self.interval * 1000:.1f}ms")
+        stacks = Counter()
+        inclusive = Counter()
+        exclusive = Counter()
+        me = threading.get_ident()
+        samples = 0
+        started = time.time()
+        t0 = time.monotonic()
+        deadline = t0 + window
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if not codes:
+                    continue
+                codes.reverse()
+                labels = [_frame_label(c) for c in codes]
+                stacks[names.get(ident, str(ident)) + ";" + ";".join(labels)] += 1
+                exclusive[(codes[-1].co_filename, codes[-1].co_name)] += 1
+                for key in {(c.co_filename, c.co_name) for c in codes}:
+                    inclusive[key] += 1
+            samples += 1
+            time.sleep(self.interval)
+        try:
+            period = (time.monotonic() - t0) / max(samples, 1)
+            self._write(started, samples, period, stacks, inclusive, exclusive)
+        except Exception as e:
+            logger.info(f"profiler write failed: {e}")
+
+    def _write(self, started, samples, period, stacks, inclusive, exclusive):
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, "profile-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(started)))
+        with open(base + ".folded", "w") as f:
+            for stack, n in stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        ms = period * 1000
+        lines = [f"samples={samples} period={ms:.2f}ms", "", "# focus functions (inclusive wall ms)"]
+        for fname, func in self.focus:
+            hits = [n for (path, name), n in inclusive.items() if name == func and os.path.basename(path) == fname]
+            lines.append(f"{fname}:{func} {sum(hits) * ms:.1f}")
+        lines += ["", "# top functions: inclusive_ms self_ms function"]
+        for (path, name), n in inclusive.most_common(50):
+            lines.append(f"{n * ms:.1f} {exclusive.get((path, name), 0) * ms:.1f} {os.path.basename(path)}:{name}")
+        with open(base + ".txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info(f"profiler done: {samples} samples written to {base}.folded / {base}.txt")
+
+
+def install_signal_handler(profiler, signum=signal.SIGUSR1):
+    """kill -USR1 <pid> 开启一次采样窗口。"""
+    def _on_signal(signum, frame):
+        profiler.start()
+    signal.signal(signum, _on_signal)
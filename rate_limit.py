@@ -0,0 +1,222 @@
+import time
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+
+# 数字越小优先级越高：cancel > create > query
+PRIORITY = {
+    "cancel": 0,
+    "create": 1,
+    "query": 2,
+}
+
+# 默认限额（每秒 / 突发），收到 429 后会自动下调
+DEFAULT_LIMITS = {
+    "cancel": (20, 20),
+    "create": (20, 20),
+    "query": (10, 10),
+}
+DEFAULT_GLOBAL_LIMIT = (30, 30)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = float(min_rate)
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        dt = now - self._last
+        if dt > 0:
+            self.tokens = min(self.burst, self.tokens + dt * self.rate)
+            self._last = now
+
+    def wait_time(self, now):
+        self._refill(now)
+        pause = self.paused_until - now
+        if self.tokens >= 1:
+            return max(pause, 0.0)
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+    def penalize(self, now, retry_after=None):
+        # 乘性下调速率，按 Retry-After 或一个令牌间隔暂停
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.paused_until = max(self.paused_until, now + pause)
+
+    def pause(self, now, seconds):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def recover(self):
+        # 加性恢复到配置上限
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+
+def parse_retry_after(value, now_epoch=None):
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        now_epoch = time.time() if now_epoch is None else now_epoch
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now_epoch)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value, now_epoch=None):
+    """X-RateLimit-Reset 可能是剩余秒数，也可能是 epoch 秒/毫秒。"""
+    if value is None:
+        return None
+    try:
+        v = float(value)
+    except ValueError:
+        return None
+    now_epoch = time.time() if now_epoch is None else now_epoch
+    if v > 1e12:
+        v = v / 1000
+    if v > 1e9:
+        v = v - now_epoch
+    return max(0.0, v)
+
+
+class RequestScheduler:
+    """
+    所有 st_http 请求在发出前先 acquire(klass)：
+      - 每类 endpoint 一个令牌桶，另有一个账户级全局令牌桶
+      - 争抢全局令牌时严格按优先级：有更高优先级在等就让路
+      - 从 429 / Retry-After / X-RateLimit-* 响应头学习限额
+      - 分别统计排队等待时间和网络耗时
+    """
+
+    def __init__(self, limits=None, global_limit=DEFAULT_GLOBAL_LIMIT, report_interval=60):
+        limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._cond = threading.Condition()
+        self._buckets = {k: TokenBucket(*v) for k, v in limits.items()}
+        self._global = TokenBucket(*global_limit)
+        self._contending = [0] * (max(PRIORITY.values()) + 1)
+        self.report_interval = report_interval
+        self._last_report = time.monotonic()
+        self.stats = {
+            k: {"requests": 0, "wait_total": 0.0, "wait_max": 0.0, "net_total": 0.0, "net_max": 0.0, "rate_limited": 0}
+            for k in limits
+        }
+
+    def acquire(self, klass):
+        """阻塞直到 klass 拿到令牌，返回排队等待秒数。"""
+        pri = PRIORITY[klass]
+        bucket = self._buckets[klass]
+        t0 = time.monotonic()
+        contending = False
+        with self._cond:
+            try:
+                while True:
+                    now = time.monotonic()
+                    own_wait = bucket.wait_time(now)
+                    if own_wait > 0:
+                        # 自己这一类的额度不够，不参与全局争抢
+                        if contending:
+                            self._contending[pri] -= 1
+                            contending = False
+                            self._cond.notify_all()
+                        self._cond.wait(own_wait)
+                        continue
+                    if not contending:
+                        self._contending[pri] += 1
+                        contending = True
+                    if any(self._contending[p] for p in range(pri)):
+                        self._cond.wait(0.05)
+                        continue
+                    global_wait = self._global.wait_time(now)
+                    if global_wait > 0:
+                        self._cond.wait(global_wait)
+                        continue
+                    bucket.take()
+                    self._global.take()
+                    break
+            finally:
+                if contending:
+                    self._contending[pri] -= 1
+                    self._cond.notify_all()
+        return time.monotonic() - t0
+
+    def try_acquire(self, klass):
+        """不等待：klass 和全局令牌都立即可用、且没有更高优先级在等时拿走令牌返回 True，否则返回 False。"""
+        pri = PRIORITY[klass]
+        bucket = self._buckets[klass]
+        with self._cond:
+            now = time.monotonic()
+            if any(self._contending[p] for p in range(pri)):
+                return False
+            if bucket.wait_time(now) > 0 or self._global.wait_time(now) > 0:
+                return False
+            bucket.take()
+            self._global.take()
+            return True
+
+    def record(self, klass, wait_s, net_s, response=None):
+        """请求结束后回报：等待时间、网络耗时、响应（None 表示连接层失败）。"""
+        now = time.monotonic()
+        with self._cond:
+            st = self.stats[klass]
+            st["requests"] += 1
+            st["wait_total"] += wait_s
+            st["wait_max"] = max(st["wait_max"], wait_s)
+            st["net_total"] += net_s
+            st["net_max"] = max(st["net_max"], net_s)
+            if response is not None:
+                self._learn(klass, now, response)
+            report = now - self._last_report > self.report_interval
+            if report:
+                self._last_report = now
+        if report:
+            logger.info(self.report())
+
+    def _learn(self, klass, now, response):
+        bucket = self._buckets[klass]
+        headers = response.headers or {}
+        if response.status_code == 429:
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            bucket.penalize(now, retry_after)
+            self._global.penalize(now, retry_after)
+            self.stats[klass]["rate_limited"] += 1
+            logger.info(f"[rate_limit] 429 on {klass}, rate -> {bucket.rate:.2f}/s, global -> {self._global.rate:.2f}/s, retry_after={retry_after}")
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            try:
+                if float(remaining) <= 0:
+                    reset = parse_reset(headers.get("X-RateLimit-Reset"))
+                    bucket.pause(now, reset if reset is not None else 1 / bucket.rate)
+                    return
+            except ValueError:
+                pass
+        if 200 <= response.status_code < 300:
+            bucket.recover()
+            self._global.recover()
+
+    def report(self):
+        parts = []
+        for k, st in self.stats.items():
+            n = st["requests"] or 1
+            parts.append(
+                f"{k}: n={st['requests']} wait_avg={st['wait_total'] / n * 1000:.1f}ms wait_max={st['wait_max'] * 1000:.1f}ms "
+                f"net_avg={st['net_total'] / n * 1000:.1f}ms net_max={st['net_max'] * 1000:.1f}ms "
+                f"429={st['rate_limited']} rate={self._buckets[k].rate:.2f}/s"
+            )
+        return "[rate_limit] " + " | ".join(parts)
@@ -0,0 +1,25 @@
+import time
+import itertools
+from collections import namedtuple
+
+
+# 一次发布的不可变快照：数据 + 单调递增版本号 + 发布时间戳
+Snapshot = namedtuple("Snapshot", ["data", "version", "ts"])
+
+
+class SnapshotHolder:
+    """
+    WS 线程 publish，策略线程 get。publish 只做一次属性赋值（原子替换整个 Snapshot），
+    读方一次 get() 拿到的 data/version/ts 一定来自同一次更新；不加锁。
+    版本号没变就说明数据没变，可以跳过重复计算。
+    """
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._snap = Snapshot(None, 0, 0.0)
+
+    def publish(self, data):
+        self._snap = Snapshot(data, next(self._counter), time.time())
+
+    def get(self):
+        return self._snap
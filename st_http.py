@@ -4,23 +4,132 @@ import time
 import base64
 import random
 import requests
+from urllib.parse import urlsplit
 from nacl.signing import SigningKey
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from rate_limit import RequestScheduler, parse_retry_after
+from latency import LatencyTracker
+import metrics
+import faults
+import http_conn
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://perps.standx.com"
 PAIR = "BTC-USD"
+# 连接池大小 >= 并发下单数，阶梯单并发发出时都能复用 keep-alive 连接
+POOL_SIZE = 32
+NEW_ORDER_PATH = "/api/new_order"
+# create_order 的 (connect, read) timeout，read 部分由 adaptive.AdaptiveController 按确认耗时调整
+order_timeout = (0.5, 1.0)
+
+
+# create_order 的请求体模板：与 json.dumps(data, separators=(",", ":")) 逐字节一致（key 顺序相同），
+# 每单只做一次字符串格式化，省掉 dict 构建和 JSON 编码
+_ORDER_TEMPLATE = (
+    '{"symbol":' + json.dumps(PAIR) + ',"side":"%s","order_type":"limit","qty":%s,"price":"%s",'
+    '"margin_mode":"cross","time_in_force":"alo","reduce_only":false,"cl_ord_id":"%s"}'
+)
+
+
+def set_order_timeout(read_timeout):
+    global order_timeout
+    order_timeout = (order_timeout[0], read_timeout)
 
 
 # --------- NEW: a shared session + retry wrapper (minimal intrusion) ---------
-session = requests.Session()
+session = http_conn.new_session(POOL_SIZE)
+scheduler = RequestScheduler()
+keep_warm = None
+
+
+def start_keep_warm(idle=15, connections=2):
+    """预解析 BASE_URL 的域名，并在会话空闲时保持 connections 条 keep-alive 连接。"""
+    global keep_warm
+    http_conn.dns_cache.prefetch(urlsplit(BASE_URL).hostname)
+    keep_warm = http_conn.KeepWarm(
+        session,
+        f"{BASE_URL}/api/query_symbol_price",
+        params={"symbol": PAIR},
+        idle=idle,
+        connections=connections,
+        before_request=lambda: scheduler.acquire("query"),
+    )
+    keep_warm.start()
+    return keep_warm
+
+REST_REQUESTS = metrics.counter("beggar_rest_requests_total", "REST attempts by endpoint class and status", ("klass", "status"))
+REST_ERRORS = metrics.counter("beggar_rest_errors_total", "Failed REST attempts (non-200 or connection error)", ("klass", "kind"))
+REST_HEDGES = metrics.counter("beggar_rest_hedges_total", "Hedged duplicate requests sent / won", ("klass", "outcome"))
 
 import time
 import random
 import requests
 from datetime import datetime, timezone
 
+# 除 5xx 外也值得重试的状态码；429 单独按 Retry-After 处理，其他 4xx 重试也不会成功
+RETRYABLE_STATUS = {408, 425}
+
+
+def classify_status(status_code):
+    """返回 "ok" / "retry" / "rate_limited" / "fatal"。"""
+    if status_code == 200:
+        return "ok"
+    if status_code == 429:
+        return "rate_limited"
+    if status_code >= 500 or status_code in RETRYABLE_STATUS:
+        return "retry"
+    return "fatal"
+
+
+class HedgeBudget:
+    """每个请求攒 ratio 个额度，发一个对冲请求花掉 1 个，保证对冲带来的额外请求不超过 ratio。"""
+
+    def __init__(self, ratio=0.05, burst=3):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+# 幂等 GET 超过历史 p95 仍未返回时，再发一份相同的请求，先回来的为准
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+hedge_budget = HedgeBudget()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+# 按 path 统计（不含 BASE_URL），BASE_URL 被改指向别的地址时仍是同一组样本
+_latency = {}
+
+
+def latency_tracker(path):
+    tracker = _latency.get(path)
+    if tracker is None:
+        tracker = _latency.setdefault(path, LatencyTracker())
+    return tracker
+
+
+def hedge_delay(path):
+    """该 path 的对冲等待时间；样本不足时返回 None（不对冲）。"""
+    tracker = _latency.get(path)
+    if tracker is None or len(tracker) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY, tracker.percentile(HEDGE_QUANTILE))
+
+
 def request_with_retry(
     session,
     method,
@@ -33,90 +142,124 @@ def request_with_retry(
     timeout=(3.0, 15),    # (connect_timeout, read_timeout)
     max_retries=5,
     backoff_base=0.4,       # seconds
+    klass=None,             # "cancel" / "create" / "query"，走 scheduler 排队限流
+    hedge=False,            # 仅用于幂等请求：慢于历史 p95 时发对冲请求
 ):
     """
-    Retry on all types of failure, including connection-level failures and non-200 HTTP status codes.
+    Retry on connection-level failures and retryable HTTP status codes (5xx, 408, 425).
+    429 waits for Retry-After (via the scheduler when `klass` is given) before retrying;
+    other 4xx responses are returned to the caller as failures immediately.
 
     If request headers contain timestamp/nonce/signature, pass `headers_factory`
     so that each retry regenerates fresh headers.
+
+    If `klass` is given, every attempt first waits for a token from the module
+    `scheduler`; queue wait and network time are logged separately.
+
+    If `hedge` is set, an attempt that is still pending after the learned p95
+    latency of this url path gets a duplicate request, subject to `hedge_budget`.
     """
     if headers is not None and headers_factory is not None:
         raise ValueError("Provide only one of `headers` or `headers_factory`")
+    path = urlsplit(url).path
 
     def _now_str():
         # 统一打印为 ISO8601（含时区）；如果你更想用本地时间，把 timezone.utc 去掉即可
         return datetime.now(timezone.utc).astimezone().isoformat(timespec="milliseconds")
 
-    def _log_failure(*, url, ts, duration_s, status_code, message):
+    def _log_failure(*, url, ts, duration_s, status_code, message, wait_s=0.0):
         # 按你要求：请求持续时间，返回码，返回消息，请求时间点
         logger.info(
             f"[request_with_retry] url={url} "
             f"ts={ts} "
+            f"wait={wait_s:.3f}s "
             f"dur={duration_s:.3f}s "
             f"status={status_code} "
             f"msg={message}"
         )
 
-    last_exc = None
-    for attempt in range(max_retries + 1):
+    def _send(started=None, acquired=False):
+        """
+        发一次请求，返回 (response, wait_s, duration_s, ts)；连接层异常原样抛出。
+        started 在拿到令牌、真正发出之前 set；acquired 表示令牌已由调用方拿到。
+        """
+        try:
+            wait_s = scheduler.acquire(klass) if klass is not None and not acquired else 0.0
+        finally:
+            if started is not None:
+                started.set()
         ts = _now_str()
         t0 = time.perf_counter()
         try:
             # regenerate headers each attempt if factory provided
             req_headers = headers_factory() if headers_factory is not None else headers
 
-            response = session.request(
-                method,
-                url,
-                headers=req_headers,
-                params=params,
-                data=data,
-                timeout=timeout,
-            )
-            duration_s = time.perf_counter() - t0
-
-            if duration_s > 3.0:
-                # 慢请求也打印日志
-                logger.info(f"[request_with_retry] Slow request: url={url} dur={duration_s:.3f}s ts={ts}")
-
-            # If the response status code is 200, return the response
-            if response.status_code == 200:
-                return response
-            else:
-                # 失败：打印耗时/状态码/消息/时间点
-                # message 用 response.text（必要时可自行截断，避免太长）
-                _log_failure(
-                    url=url,
-                    ts=ts,
-                    duration_s=duration_s,
-                    status_code=response.status_code,
-                    message=response.text,
+            response = None
+            if faults.injector is not None:
+                response = faults.injector.http(method, url, timeout)
+            if response is None:
+                response = session.request(
+                    method,
+                    url,
+                    headers=req_headers,
+                    params=params,
+                    data=data,
+                    timeout=timeout,
                 )
-                # For non-200 status codes, raise an exception to trigger retry logic
-                last_exc = Exception(f"Non-200 response: {response.status_code} {response.text}")
-                if attempt >= max_retries:
-                    raise last_exc
-
-                # exponential backoff + small jitter
-                sleep_s = backoff_base * (2 ** attempt) + random.uniform(0, 0.2)
-                logger.info(f"Non-200 response received: {response.status_code}. Retrying in {sleep_s} seconds...")
-                time.sleep(sleep_s)
-
         except (requests.exceptions.ConnectionError,
                 requests.exceptions.Timeout,
                 requests.exceptions.ChunkedEncodingError) as e:
             duration_s = time.perf_counter() - t0
-            last_exc = e
-
+            if klass is not None:
+                scheduler.record(klass, wait_s, duration_s)
+            REST_ERRORS.labels(klass=klass, kind=type(e).__name__).inc()
             # 失败：打印耗时/状态码/消息/时间点（此类异常没有 HTTP 返回码）
-            _log_failure(
-                url=url,
-                ts=ts,
-                duration_s=duration_s,
-                status_code=None,
-                message=repr(e),
-            )
+            _log_failure(url=url, ts=ts, duration_s=duration_s, status_code=None, message=repr(e), wait_s=wait_s)
+            raise
+        duration_s = time.perf_counter() - t0
+        if klass is not None:
+            scheduler.record(klass, wait_s, duration_s, response)
+        REST_REQUESTS.labels(klass=klass, status=response.status_code).inc()
+        if response.status_code == 200:
+            latency_tracker(path).record(duration_s)
+        return response, wait_s, duration_s, ts
+
+    def _send_hedged():
+        delay = hedge_delay(path)
+        if delay is None:
+            return _send()
+        started = threading.Event()
+        first = _hedge_pool.submit(_send, started)
+        # delay 是网络耗时的 p95：从拿到令牌开始计时，排队等令牌 / 等线程池的时间不算
+        started.wait()
+        done, _ = wait([first], timeout=delay)
+        if done or not hedge_budget.spend():
+            return first.result()
+        if klass is not None and not scheduler.try_acquire(klass):
+            # 令牌要排队说明正在限流，这时对冲只会和正常请求抢额度
+            return first.result()
+        logger.info(f"[request_with_retry] hedging url={url} after {delay:.3f}s")
+        REST_HEDGES.labels(klass=klass, outcome="sent").inc()
+        second = _hedge_pool.submit(_send, acquired=True)
+        last = None
+        for f in as_completed([first, second]):
+            if f.exception() is None and f.result()[0].status_code == 200:
+                if f is second:
+                    REST_HEDGES.labels(klass=klass, outcome="won").inc()
+                return f.result()
+            last = f
+        return last.result()
 
+    last_exc = None
+    for attempt in range(max_retries + 1):
+        if hedge:
+            hedge_budget.earn()
+        try:
+            response, wait_s, duration_s, ts = _send_hedged() if hedge else _send()
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            last_exc = e
             if attempt >= max_retries:
                 raise
 
@@ -124,6 +267,44 @@ def request_with_retry(
             sleep_s = backoff_base * (2 ** attempt) + random.uniform(0, 0.2)
             logger.info(f"Connection error encountered: {e}. Retrying in {sleep_s} seconds...")
             time.sleep(sleep_s)
+            continue
+
+        if duration_s > 3.0 or wait_s > 1.0:
+            # 慢请求也打印日志
+            logger.info(f"[request_with_retry] Slow request: url={url} wait={wait_s:.3f}s dur={duration_s:.3f}s ts={ts}")
+
+        kind = classify_status(response.status_code)
+        if kind == "ok":
+            return response
+
+        # 失败：打印耗时/状态码/消息/时间点
+        # message 用 response.text（必要时可自行截断，避免太长）
+        _log_failure(
+            url=url,
+            ts=ts,
+            duration_s=duration_s,
+            status_code=response.status_code,
+            message=response.text,
+            wait_s=wait_s,
+        )
+        REST_ERRORS.labels(klass=klass, kind=f"http_{response.status_code}").inc()
+        last_exc = Exception(f"Non-200 response: {response.status_code} {response.text}")
+        if kind == "fatal":
+            # 参数/签名/业务错误，重试也不会成功，交给调用方按非 200 处理
+            return response
+        if attempt >= max_retries:
+            raise last_exc
+
+        if kind == "rate_limited":
+            # 带 klass 时 scheduler 已按 Retry-After 暂停令牌桶，下一次 acquire 自然会等
+            retry_after = parse_retry_after((response.headers or {}).get("Retry-After"))
+            sleep_s = 0.0 if klass is not None else (retry_after if retry_after is not None else backoff_base * (2 ** attempt))
+        else:
+            # exponential backoff + small jitter
+            sleep_s = backoff_base * (2 ** attempt) + random.uniform(0, 0.2)
+        logger.info(f"Non-200 response received: {response.status_code} ({kind}). Retrying in {sleep_s} seconds...")
+        if sleep_s:
+            time.sleep(sleep_s)
 
     # theoretically unreachable
     raise last_exc
@@ -163,6 +344,8 @@ def get_price(auth):
         url,
         headers_factory=lambda: get_headers(auth),
         params=params,
+        klass="query",
+        hedge=True,
     )
     if resp.status_code != 200:
         raise Exception(f"get_price failed: {resp.status_code} {resp.text}")
@@ -170,40 +353,29 @@ def get_price(auth):
 
 
 # https://docs.standx.com/standx-api/perps-http#create-new-order
-def create_order(auth, price, qty, side):
-    url = f"{BASE_URL}/api/new_order"
-    cl_ord_id = str(uuid.uuid4())
-    data = {
-        "symbol": PAIR,
-        "side": side,
-        "order_type": "limit",
-        "qty": qty,
-        "price": str(price),
-        "margin_mode": "cross",
-        "time_in_force": "alo",
-        "reduce_only": False,
-        "cl_ord_id": cl_ord_id,
-    }
-
-    payload_str = json.dumps(data, separators=(",", ":"))
+def create_order(auth, price, qty, side, cl_ord_id=None):
+    url = BASE_URL + NEW_ORDER_PATH
+    cl_ord_id = cl_ord_id or str(uuid.uuid4())
+    payload_str = _ORDER_TEMPLATE % (side, json.dumps(qty), price, cl_ord_id)
     resp = request_with_retry(
         session,
         "POST",
         url,
-        timeout=(0.5, 1),
+        timeout=order_timeout,
         max_retries=0,
         headers_factory=lambda: get_headers(auth, payload_str),
         data=payload_str,
+        klass="create",
     )
     if resp.status_code != 200:
-        raise Exception(f"create_order failed: {resp.status_code} {resp.text} data: {data}")
+        raise Exception(f"create_order failed: {resp.status_code} {resp.text} data: {payload_str}")
     logger.info(f"creating order: side={side}, price={price}, qty={qty}, cl_ord_id={cl_ord_id}")
     return cl_ord_id
 
 
-def maker_clean_position(auth, price, qty, side):
+def maker_clean_position(auth, price, qty, side, cl_ord_id=None):
     url = f"{BASE_URL}/api/new_order"
-    cl_ord_id = str(uuid.uuid4())
+    cl_ord_id = cl_ord_id or str(uuid.uuid4())
     data = {
         "symbol": PAIR,
         "side": side,
@@ -223,6 +395,7 @@ def maker_clean_position(auth, price, qty, side):
         url,
         headers_factory=lambda: get_headers(auth, payload_str),
         data=payload_str,
+        klass="create",
     )
     if resp.status_code != 200:
         raise Exception(f"create_order failed: {resp.status_code} {resp.text}")
@@ -248,6 +421,7 @@ def taker_clean_position(auth, qty, side):
         url,
         headers_factory=lambda: get_headers(auth, payload_str),
         data=payload_str,
+        klass="create",
     )
     if resp.status_code != 200:
         raise Exception(f"create_order failed: {resp.status_code} {resp.text}")
@@ -270,6 +444,7 @@ def cancel_orders(auth, cl_ord_ids):
         url,
         headers_factory=lambda: get_headers(auth, payload_str),
         data=payload_str,
+        klass="cancel",
     )
     if resp.status_code != 200:
         raise Exception(f"cancel_orders failed: {resp.status_code} {resp.text}")
@@ -286,6 +461,8 @@ def query_order(auth, cl_ord_id):
         url,
         headers_factory=lambda: get_headers(auth),
         params=params,
+        klass="query",
+        hedge=True,
     )
     if resp.status_code != 200:
         raise Exception(f"query_position failed: {resp.status_code} {resp.text}")
@@ -301,6 +478,8 @@ def query_orders(auth):
         url,
         headers_factory=lambda: get_headers(auth),
         params=params,
+        klass="query",
+        hedge=True,
     )
     if resp.status_code != 200:
         raise Exception(f"query_orders failed: {resp.status_code} {resp.text}")
@@ -316,6 +495,8 @@ def query_positions(auth):
         url,
         headers_factory=lambda: get_headers(auth),
         params=params,
+        klass="query",
+        hedge=True,
     )
     if resp.status_code != 200:
         raise Exception(f"query_position failed: {resp.status_code} {resp.text}")
@@ -1,12 +1,21 @@
 import json
 import threading
 import time
+from types import MappingProxyType
+from collections import deque
 import websocket
 from nacl.signing import SigningKey
 import logging
+import metrics
+import faults
+import gc_control
 
 logger = logging.getLogger(__name__)
 
+WS_CONNECTS = metrics.counter("beggar_ws_connects_total", "WS connection attempts", ("feed",))
+WS_RECONNECTS = metrics.counter("beggar_ws_reconnects_total", "WS reconnects after a drop", ("feed",))
+BOOK_FRAMES = metrics.counter("beggar_book_frames_total", "depth_book frames by outcome", ("outcome",))
+
 
 
 class StandXWSBase:
@@ -25,11 +34,21 @@ class StandXWSBase:
 
     def start(self):
         self._stop = False
+        connects = WS_CONNECTS.labels(feed=self.name)
+        reconnects = WS_RECONNECTS.labels(feed=self.name)
+        first = True
         while not self._stop:
+            connects.inc()
+            if not first:
+                reconnects.inc()
+            first = False
+            on_message = self._on_message
+            if faults.injector is not None:
+                on_message = faults.injector.wrap_ws(self.name, on_message)
             self._ws = websocket.WebSocketApp(
                 self.ws_url,
                 on_open=self._on_open,
-                on_message=self._on_message,
+                on_message=on_message,
                 on_error=self._on_error,
                 on_close=self._on_close,
             )
@@ -93,50 +112,94 @@ class StandXPriceWS(StandXWSBase):
 
 
 
+def _is_sorted(levels, descending):
+    if descending:
+        return all(levels[i][0] >= levels[i + 1][0] for i in range(len(levels) - 1))
+    return all(levels[i][0] <= levels[i + 1][0] for i in range(len(levels) - 1))
+
+
 class StandXBookWS(StandXWSBase):
+    """
+    depth_book 帧在 WS 线程上只做一次子串判断，原始字符串放进 maxlen=1 的槽位（只保留最新）；
+    独立解码线程只解析 asks/bids 两个数组，排好序、截到前 levels 档后交给 setter。
+    已经被新帧覆盖的旧帧直接丢弃，不做任何解析。
+
+    设置了 levels 且交易所推送本身已按价格排好序时，只逐档读前 levels 档，后面的档位不解析；
+    是否有序由完整解码判断，之后每 verify_every 帧完整解码一次重新确认，发现乱序就退回完整解码。
+    """
+
     def __init__(
         self,
         setter,
         symbol="BTC-USD",
         ws_url="wss://perps.standx.com/ws-stream/v1",
         reconnect_sleep=1,
+        levels=None,
+        stats_interval=60,
+        verify_every=100,
     ):
         super().__init__("depth_book", ws_url, reconnect_sleep)
         self.symbol = symbol
         self.setter = setter
+        self.levels = levels or None
+        self.stats_interval = stats_interval
+        self.verify_every = verify_every
+        self._presorted = False
+        self._until_verify = 0
+        self._slot = deque(maxlen=1)
+        self._frame_event = threading.Event()
+        self._decoder_thread = None
+        self._json = json.JSONDecoder()
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self._received_total = BOOK_FRAMES.labels(outcome="received")
+        self._decoded_total = BOOK_FRAMES.labels(outcome="decoded")
+        self._dropped_total = BOOK_FRAMES.labels(outcome="dropped")
+
+    def start(self):
+        self._stop = False
+        if self._decoder_thread is None or not self._decoder_thread.is_alive():
+            self._decoder_thread = threading.Thread(target=self._decode_loop, daemon=True)
+            self._decoder_thread.start()
+        super().start()
+
+    def stop(self):
+        super().stop()
+        self._frame_event.set()
+
+    def stats(self):
+        return {
+            "received": self.frames_received,
+            "decoded": self.frames_decoded,
+            "dropped": self.frames_dropped,
+        }
 
+    # 以下 helper 依赖 decode 的输出：float 档位，asks 升序、bids 降序。
+    # 最优价 O(1) 取第一档，累计深度遇到越界价格即停，不做字符串转换也不建临时序列。
     def depth_above_price(self, data, price):
         price = float(price)
-        bids = data["bids"]
-        total_qty = 0
-        for p_str, qty_str in bids:
-            p = float(p_str)
-            qty = float(qty_str)
-            if p >= price:
-                total_qty += qty
+        total_qty = 0.0
+        for p, qty in data["bids"]:
+            if p < price:
+                break
+            total_qty += qty
         return total_qty
 
     def depth_below_price(self, data, price):
         price = float(price)
-        asks = data["asks"]
-        total_qty = 0
-        for p_str, qty_str in asks:
-            p = float(p_str)
-            qty = float(qty_str)
-            if p <= price:
-                total_qty += qty
+        total_qty = 0.0
+        for p, qty in data["asks"]:
+            if p > price:
+                break
+            total_qty += qty
         return total_qty
 
     def get_mid_price(self, data):
-        best_ask = min(float(p) for p, _ in data['asks'])
-        best_bid = max(float(p) for p, _ in data['bids'])
-        mid_price = (best_ask + best_bid) / 2
-        return mid_price
-    
+        return (data['asks'][0][0] + data['bids'][0][0]) / 2
+
     def get_best_ask_bid(self, data):
-        best_ask = min(float(p) for p, _ in data['asks'])
-        best_bid = max(float(p) for p, _ in data['bids'])
-        return best_ask, best_bid
+        return data['asks'][0][0], data['bids'][0][0]
         
    
     def _on_open(self, ws):
@@ -152,18 +215,127 @@ class StandXBookWS(StandXWSBase):
         )
 
     def _on_message(self, ws, message):
-        msg = json.loads(message)
-        if msg.get("channel") == "depth_book":
-            data = msg.get("data")
-            self.setter(data)
-        else:
-            logger.info("book ws other message:", msg)
+        if '"depth_book"' not in message:
+            logger.info(f"book ws other message: {message[:200]}")
+            return
+        self.frames_received += 1
+        self._received_total.inc()
+        if self._slot:
+            self.frames_dropped += 1
+            self._dropped_total.inc()
+        self._slot.append(message)
+        self._frame_event.set()
+
+    def _decode_loop(self):
+        last_stats = time.monotonic()
+        while not self._stop:
+            self._frame_event.wait(1)
+            self._frame_event.clear()
+            try:
+                raw = self._slot.pop()
+            except IndexError:
+                raw = None
+            if raw is not None:
+                try:
+                    book = self.decode(raw)
+                except Exception as e:
+                    logger.info(f"book ws decode failed: {e}")
+                    book = None
+                if book is not None:
+                    self.frames_decoded += 1
+                    self._decoded_total.inc()
+                    self.setter(book)
+            if not self._slot:
+                # 下一帧还没到，把年轻代回收放在这个空档里
+                gc_control.idle()
+            now = time.monotonic()
+            if now - last_stats > self.stats_interval:
+                last_stats = now
+                logger.info(f"book ws frames: {self.stats()}")
+
+    def _extract_levels(self, raw, key):
+        idx = raw.find(key)
+        if idx < 0:
+            return None
+        idx += len(key)
+        while raw[idx] in " \t\r\n":
+            idx += 1
+        levels, _ = self._json.raw_decode(raw, idx)
+        return levels
+
+    def _prefix_levels(self, raw, key, n):
+        """
+        只截取数组前 n 档的原始文本再解析（每档 ["price","qty"] 里没有嵌套的 "]"）；
+        不足 n 档时截到的文本已经含数组自己的 "]"，raw_decode 在那里停下，补的 "]" 被忽略。
+        后面剩下的 "]" 不够 n 个时（数组不足 n 档且在帧末尾），数组本身就很短，直接原地解析。
+        """
+        idx = raw.find(key)
+        if idx < 0:
+            return None
+        idx += len(key)
+        while raw[idx] in " \t\r\n":
+            idx += 1
+        end = idx
+        try:
+            for _ in range(n):
+                end = raw.find("]", end) + 1
+                if not end:
+                    levels, _ = self._json.raw_decode(raw, idx)
+                    break
+            else:
+                levels, _ = self._json.raw_decode(raw[idx:end] + "]")
+        except ValueError:
+            return None
+        return [(float(p), float(q)) for p, q in levels]
+
+    def _decode_prefix(self, raw):
+        asks = self._prefix_levels(raw, '"asks":', self.levels)
+        bids = self._prefix_levels(raw, '"bids":', self.levels)
+        if not asks or not bids or not _is_sorted(asks, False) or not _is_sorted(bids, True):
+            return None
+        return MappingProxyType({"asks": tuple(asks), "bids": tuple(bids)})
+
+    def decode(self, raw):
+        """只解析 asks/bids；返回只读的 {"asks": 升序, "bids": 降序}，每档为 (price, qty) float 元组。"""
+        if self.levels and self._presorted and self._until_verify > 0:
+            self._until_verify -= 1
+            book = self._decode_prefix(raw)
+            if book is not None:
+                return book
+        asks = self._extract_levels(raw, '"asks":')
+        bids = self._extract_levels(raw, '"bids":')
+        if asks is None or bids is None:
+            msg = json.loads(raw)
+            data = msg.get("data") or {}
+            asks = data.get("asks")
+            bids = data.get("bids")
+            if asks is None or bids is None:
+                return None
+        if not asks or not bids:
+            return None
+        asks = [(float(p), float(q)) for p, q in asks]
+        bids = [(float(p), float(q)) for p, q in bids]
+        if self.levels:
+            presorted = _is_sorted(asks, False) and _is_sorted(bids, True)
+            if presorted != self._presorted:
+                logger.info(f"depth_book levels {'sorted' if presorted else 'unsorted'}, "
+                            f"{'reading only the top ' + str(self.levels) if presorted else 'decoding full book'}")
+                self._presorted = presorted
+            self._until_verify = self.verify_every
+        asks.sort()
+        bids.sort(reverse=True)
+        if self.levels:
+            del asks[self.levels:]
+            del bids[self.levels:]
+        return MappingProxyType({"asks": tuple(asks), "bids": tuple(bids)})
 
 
 class StandXPositionWS(StandXWSBase):
+    """仓位/订单推送按顺序放进 events.EventQueue，由策略线程 drain。"""
+
     def __init__(
         self,
-        setter,
+        events,
         access_token,
         symbol="BTC-USD",
         ws_url="wss://perps.standx.com/ws-stream/v1",
@@ -171,15 +343,16 @@ class StandXPositionWS(StandXWSBase):
     ):
         super().__init__("position", ws_url, reconnect_sleep)
         self.symbol = symbol
-        self.setter = setter
+        self.events = events
         self.access_token = access_token
 
    
     def _on_open(self, ws):
+        self.events.on_connect()
         auth_msg = {
             "auth": {
                 "token": self.access_token,
-                "streams": [{"channel": "position"}]
+                "streams": [{"channel": "position"}, {"channel": "order"}]
             }
         }
         ws.send(json.dumps(auth_msg))
@@ -188,12 +361,11 @@ class StandXPositionWS(StandXWSBase):
     def _on_message(self, ws, message):
         msg = json.loads(message)
         ch = msg.get("channel")
-        if ch == "position":
-            p = msg.get("data", {})
-            self.setter(p)
+        if ch in ("position", "order"):
+            self.events.push(ch, msg.get("data", {}), msg.get("seq"))
             return
         else:
-            logger.info("position ws other message:", msg)
+            logger.info(f"position ws other message: {msg}")
 
 
 
@@ -0,0 +1,85 @@
+import time
+import logging
+
+from st_ws import StandXBookWS, StandXPositionWS
+import common
+from common import recover
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """
+    进程级常驻：WS 行情/仓位连接整个进程只建一次，策略崩溃时只重启策略状态机，
+    不再重复创建 WS 线程（HTTP 连接池是 st_http 的模块级 session，本来就跨重启复用）。
+    """
+
+    def __init__(self, auth, set_book, position_events, restart_delay=1, should_exit=None, cooldown=None, book_levels=None,
+                 watchdog=None):
+        self.auth = auth
+        self.watchdog = watchdog
+        self.restart_delay = float(restart_delay)
+        self.should_exit = should_exit or (lambda: False)
+        self.cooldown = cooldown
+        self.book_ws = StandXBookWS(set_book, levels=book_levels)
+        self.pos_ws = StandXPositionWS(position_events, access_token=auth['access_token'])
+        self.restarts = 0
+        self._threads = []
+
+    def start_feeds(self):
+        if self._threads:
+            return
+        self._threads.append(self.book_ws.start_in_thread())
+        self._threads.append(self.pos_ws.start_in_thread())
+        logger.info("supervisor feeds started")
+
+    def stop_feeds(self):
+        self.book_ws.stop()
+        self.pos_ws.stop()
+        for t in self._threads:
+            t.join(timeout=2)
+        self._threads = []
+        logger.info("supervisor feeds stopped")
+
+    def cleanup(self):
+        # 先各查一次挂单和仓位，干净时直接返回；有 journal 时按已知 cl_ord_id 精确撤单。
+        # 只有确实还有挂单/仓位时才走 clean_orders / clean_positions 的轮询清理。
+        # watchdog 里上一轮策略的挂单 id 先清掉，recover 之后它们已经不存在，不能再拿去撤
+        if self.watchdog is not None:
+            self.watchdog.set_orders(())
+        try:
+            recover(self.auth)
+            if common.journal is not None:
+                common.journal.compact()
+        except Exception as e:
+            logger.info(f"supervisor cleanup failed: {e}")
+
+    def run(self, strategy, *args):
+        """
+        strategy(book_ws, pos_ws, *args) 抛异常时：清一次挂单/仓位，等待 restart_delay 后重启，
+        WS 连接保持不变。
+        """
+        self.start_feeds()
+        self.cleanup()
+        try:
+            while True:
+                t0 = time.monotonic()
+                try:
+                    strategy(self.book_ws, self.pos_ws, *args)
+                except Exception as e:
+                    logger.info(f"Exception in strategy: {e!r}", exc_info=True)
+                finally:
+                    self.cleanup()
+                if self.should_exit():
+                    break
+                self.restarts += 1
+                logger.info(f"restarting strategy (#{self.restarts}) in {self.restart_delay}s, "
+                            f"last run {time.monotonic() - t0:.3f}s")
+                if self.cooldown is not None:
+                    self.cooldown.sleep(self.restart_delay)
+                else:
+                    time.sleep(self.restart_delay)
+                if self.should_exit():
+                    break
+        finally:
+            self.stop_feeds()
@@ -0,0 +1,58 @@
+import pytest
+
+import st_http
+from adaptive import AdaptiveController, DEFAULT_THRESHOLDS
+from latency import LatencyTracker
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(st_http, "order_timeout", st_http.order_timeout)
+    c = AdaptiveController(interval=0, min_samples=10)
+    c.sources["ack"] = LatencyTracker(1024)
+    return c
+
+
+def _feed(c, gap, n=100):
+    for i in range(n):
+        c.on_frame(now=i * gap)
+
+
+def test_defaults_until_enough_samples(controller):
+    _feed(controller, 0.01, n=5)
+    assert controller.update(now=1) == DEFAULT_THRESHOLDS
+
+
+def test_fast_link_tightens(controller):
+    _feed(controller, 0.02)
+    for _ in range(100):
+        controller.sources["ack"].record(0.05)
+    th = controller.update(now=1)
+    assert th.quote_age == pytest.approx(0.15)
+    assert th.cancel_age == pytest.approx(0.3)
+    assert th.ack_timeout == pytest.approx(0.5)
+    assert st_http.order_timeout[1] == pytest.approx(0.5)
+
+
+def test_degraded_p99_never_loosens_past_defaults(controller):
+    _feed(controller, 0.02)
+    controller.update(now=1)
+    _feed(controller, 0.5)
+    for _ in range(100):
+        controller.sources["ack"].record(2.0)
+    th = controller.update(now=2)
+    assert th == DEFAULT_THRESHOLDS
+
+
+def test_rule_override_cannot_raise_ceiling(monkeypatch):
+    c = AdaptiveController(rules={"cancel_age": ("feed_gap", 0.99, 6.0, 0.3, 5.0)}, interval=0, min_samples=10)
+    c.sources["ack"] = LatencyTracker(1024)
+    _feed(c, 0.5)
+    assert c.update(now=1).cancel_age == DEFAULT_THRESHOLDS.cancel_age
+
+
+def test_in_between_follows_p99(controller):
+    _feed(controller, 0.08)
+    th = controller.update(now=1)
+    assert th.quote_age == pytest.approx(0.24)
+    assert th.cancel_age == pytest.approx(0.48)
@@ -0,0 +1,67 @@
+import time
+import threading
+
+from cooldown import Cooldown
+
+
+def test_wake_before_sleep_is_not_lost():
+    c = Cooldown()
+    c.wake("fill")
+    t0 = time.monotonic()
+    assert c.sleep(1, ("exit", "fill")) == "fill"
+    assert time.monotonic() - t0 < 0.1
+    # 已被这次 sleep 消费
+    assert c.sleep(0.05, ("exit", "fill")) is None
+
+
+def test_clear_drops_wakes_seen_by_the_decision():
+    c = Cooldown()
+    c.wake("fill")
+    c.wake("position")
+    c.clear(("fill",))
+    assert c.sleep(0.05, ("fill",)) is None
+    assert c.sleep(0.05, ("position",)) == "position"
+    c.wake("fill")
+    c.clear()
+    assert c.sleep(0.05, ("fill", "position")) is None
+
+
+def test_exit_is_sticky():
+    c = Cooldown()
+    c.wake("exit")
+    c.clear()
+    assert c.sleep(1) == "exit"
+    assert c.sleep(1, ("fill", "exit")) == "exit"
+
+
+def test_wake_during_sleep():
+    c = Cooldown()
+    threading.Timer(0.05, c.wake, args=("fill",)).start()
+    t0 = time.monotonic()
+    assert c.sleep(2, ("exit", "fill")) == "fill"
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_unrelated_wake_does_not_end_sleep():
+    c = Cooldown()
+    threading.Timer(0.02, c.wake, args=("position",)).start()
+    assert c.sleep(0.1, ("exit", "fill")) is None
+    assert c.is_set("position")
+
+
+def test_watch_fires_once():
+    c = Cooldown()
+    c.watch("depth", lambda book: book["depth"] >= 4)
+    c.check({"depth": 1})
+    assert not c.is_set("depth")
+    c.check({"depth": 5})
+    assert c.sleep(1, ("depth",)) == "depth"
+    c.check({"depth": 5})
+    assert not c.is_set("depth")
+
+
+def test_failing_predicate_is_ignored():
+    c = Cooldown()
+    c.watch("bad", lambda book: book["missing"])
+    c.check({})
+    assert c.sleep(0.02, ("bad",)) is None
@@ -0,0 +1,88 @@
+import threading
+
+from events import EventQueue
+
+
+def test_drain_returns_events_in_order():
+    q = EventQueue()
+    q.push("position", {"qty": "1"}, 1)
+    q.push("order", {"status": "new"}, 7)
+    q.push("position", {"qty": "0"}, 2)
+    events, gap = q.drain()
+    assert [e.seq for e in events] == [1, 2, 3]
+    assert [e.channel for e in events] == ["position", "order", "position"]
+    assert not gap
+    assert q.drain() == ([], False)
+
+
+def test_remote_seq_jump_is_a_gap_once():
+    q = EventQueue()
+    q.push("position", {}, 1)
+    q.push("position", {}, 3)
+    assert q.drain()[1]
+    assert not q.drain()[1]
+
+
+def test_seq_is_tracked_per_channel():
+    q = EventQueue()
+    q.push("position", {}, 10)
+    q.push("order", {}, 50)
+    q.push("position", {}, 11)
+    q.push("order", {}, 51)
+    assert not q.drain()[1]
+
+
+def test_overflow_drops_oldest_and_marks_gap():
+    q = EventQueue(maxlen=2)
+    for i in range(3):
+        q.push("order", {"i": i})
+    events, gap = q.drain()
+    assert [e.data["i"] for e in events] == [1, 2]
+    assert gap
+
+
+def test_reconnect_is_a_gap_and_resets_seq():
+    q = EventQueue()
+    q.on_connect()
+    q.push("position", {}, 5)
+    assert not q.drain()[1]
+    q.on_connect()
+    # 重连后交易所 seq 重新开始，不应再算一次 gap
+    q.push("position", {}, 1)
+    assert q.drain()[1]
+    q.push("position", {}, 2)
+    assert not q.drain()[1]
+
+
+def test_listener_sees_every_event():
+    seen = []
+    q = EventQueue(listener=seen.append)
+    q.push("order", {}, 1)
+    q.push("order", {}, 2)
+    assert [e.remote_seq for e in seen] == [1, 2]
+
+
+def test_no_gap_lost_under_concurrent_drain():
+    q = EventQueue(maxlen=1000000)
+    marked = 2000
+    done = threading.Event()
+
+    def producer():
+        for i in range(marked):
+            # 每次都跳号
+            q.push("order", {}, i * 2)
+        done.set()
+
+    seen = 0
+    t = threading.Thread(target=producer)
+    t.start()
+    while not done.is_set():
+        if q.drain()[1]:
+            seen += 1
+    if q.drain()[1]:
+        seen += 1
+    t.join()
+    assert q.gaps == marked - 1
+    # 合并到同一次 drain 的 gap 只报一次，但至少报一次，且最后一次 gap 之后一定能看到
+    assert seen >= 1
+    assert not q.drain()[1]
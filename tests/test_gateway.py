@@ -0,0 +1,110 @@
+import socket
+import threading
+
+import pytest
+
+import gateway
+import st_http
+from gateway import GatewayClient, GatewayServer
+
+
+def test_str_roundtrip():
+    buf = gateway.pack_str("") + gateway.pack_str("买 0.001") + gateway.pack_str("x" * 300)
+    s1, off = gateway.unpack_str(buf, 0)
+    s2, off = gateway.unpack_str(buf, off)
+    s3, off = gateway.unpack_str(buf, off)
+    assert (s1, s2, s3) == ("", "买 0.001", "x" * 300)
+    assert off == len(buf)
+
+
+def test_frame_roundtrip_over_socket():
+    a, b = socket.socketpair()
+    try:
+        a.sendall(gateway.frame(gateway.OP_CREATE, 0xFFFFFFFF, b"body") + gateway.frame(gateway.OP_PING, 7))
+        assert gateway.read_frame(b) == (gateway.OP_CREATE, 0xFFFFFFFF, b"body")
+        assert gateway.read_frame(b) == (gateway.OP_PING, 7, b"")
+        a.close()
+        with pytest.raises(ConnectionError):
+            gateway.read_frame(b)
+    finally:
+        b.close()
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    monkeypatch.setattr(st_http, "create_order", lambda auth, price, qty, side, cl_ord_id=None: f"{side}:{price}:{qty}:{cl_ord_id}")
+    monkeypatch.setattr(st_http, "cancel_orders", lambda auth, ids: {"canceled": ids})
+    monkeypatch.setattr(st_http, "query_orders", lambda auth: {"result": []})
+
+
+@pytest.fixture
+def sock_path(tmp_path):
+    return str(tmp_path / "gw.sock")
+
+
+def _start(path, address="0xAbC"):
+    server = GatewayServer(path, {"address": address}, workers=2)
+    server.listen()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_client_server_ops(fake_http, sock_path):
+    server = _start(sock_path)
+    client = GatewayClient(sock_path, timeout=5, auth={"address": "0xabc"})
+    try:
+        assert client.account == "0xabc"
+        assert client.create_order(None, "100.5", "0.1", "sell", cl_ord_id="id1") == "sell:100.5:0.1:id1"
+        assert client.cancel_orders(None, ["a", "b"]) == {"canceled": ["a", "b"]}
+        assert client.cancel_orders(None, []) is None
+        assert client.query_orders(None) == {"result": []}
+    finally:
+        client.close()
+        server.close()
+
+
+def test_client_refuses_other_account(sock_path):
+    server = _start(sock_path, address="0xother")
+    try:
+        with pytest.raises(RuntimeError, match="0xother"):
+            GatewayClient(sock_path, timeout=5, auth={"address": "0xabc"})
+    finally:
+        server.close()
+
+
+def test_second_server_refuses_live_socket(sock_path):
+    server = _start(sock_path)
+    try:
+        with pytest.raises(RuntimeError, match="in use"):
+            GatewayServer(sock_path, {"address": "0xabc"}).listen()
+    finally:
+        server.close()
+
+
+def test_server_replaces_stale_socket(sock_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(sock_path)
+    stale.close()
+    server = _start(sock_path)
+    try:
+        GatewayClient(sock_path, timeout=5).close()
+    finally:
+        server.close()
+
+
+def test_client_reconnects_after_gateway_restart(fake_http, sock_path):
+    server = _start(sock_path)
+    client = GatewayClient(sock_path, timeout=5, auth={"address": "0xabc"})
+    try:
+        assert client.query_orders(None) == {"result": []}
+        server.close()
+        with pytest.raises(Exception):
+            # 网关不在时调用失败，而不是挂住
+            for _ in range(50):
+                client.query_orders(None)
+        server = _start(sock_path)
+        assert client.query_orders(None) == {"result": []}
+        assert client.reconnects >= 1
+    finally:
+        client.close()
+        server.close()
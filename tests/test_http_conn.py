@@ -0,0 +1,37 @@
+import threading
+
+from http_conn import KeepWarm
+
+
+class FakeAdapter:
+    last_used = 0.0
+
+
+class FakeSession:
+    def __init__(self):
+        self.gets = 0
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def get_adapter(self, url):
+        return FakeAdapter()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.gets += 1
+            self.threads.add(threading.get_ident())
+
+
+def test_keep_warm_reuses_ping_threads():
+    session = FakeSession()
+    kw = KeepWarm(session, "http://127.0.0.1/ping", connections=3, interval=3600)
+    kw.start()
+    try:
+        for _ in range(50):
+            kw.ping()
+        # start() 自己还会在后台 ping 一次
+        assert kw.pings >= 50
+        assert session.gets >= 150
+        assert len(session.threads) <= 3
+    finally:
+        kw.stop()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from journal import Journal, JournalState
+
+
+def test_state_tracks_open_orders_and_position():
+    state = JournalState()
+    state.apply("intent", {"cl_ord_id": "a", "side": "buy", "price": "100.00", "qty": "0.1"})
+    state.apply("intent", {"cl_ord_id": "b", "side": "sell", "price": "101.00", "qty": "0.1"})
+    state.apply("intent", {"cl_ord_id": "c", "side": "sell", "price": "102.00", "qty": "0.1"})
+    state.apply("reject", {"cl_ord_id": "c"})
+    state.apply("cancel", {"cl_ord_ids": ["a"]})
+    state.apply("position", {"qty": "-0.1"})
+    assert state.open_orders == {"b": {"side": "sell", "price": "101.00", "qty": "0.1"}}
+    assert state.position_qty == -0.1
+    state.apply("clean", {})
+    assert state.open_orders == {}
+
+
+def test_replay_after_close(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path)
+    j.record("intent", cl_ord_id="a", side="buy", price="100.00", qty="0.1")
+    j.record("intent", cl_ord_id="b", side="sell", price="101.00", qty="0.1")
+    j.record("ack", cl_ord_id="a")
+    j.record("cancel", cl_ord_ids=["b"])
+    j.record("position", qty=0.2)
+    j.close()
+    state = Journal.replay(path)
+    assert list(state.open_orders) == ["a"]
+    assert state.position_qty == 0.2
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        json.dumps({"event": "intent", "cl_ord_id": "a", "side": "buy", "price": "1", "qty": "1"}) + "\n"
+        + '{"event": "cancel", "cl_ord_'
+    )
+    state = Journal.replay(str(path))
+    assert list(state.open_orders) == ["a"]
+
+
+def test_flush_writes_without_close(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path, fsync_interval=60)
+    j.record("intent", cl_ord_id="a", side="buy", price="1", qty="1")
+    j.flush()
+    assert list(Journal.replay(path).open_orders) == ["a"]
+    j.close()
+
+
+def test_compact_keeps_state_and_appends_after(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path)
+    for i in range(50):
+        j.record("intent", cl_ord_id=str(i), side="buy", price="1", qty="1")
+        j.record("cancel", cl_ord_ids=[str(i)])
+    j.record("intent", cl_ord_id="open", side="sell", price="2", qty="1")
+    j.record("position", qty=-1)
+    j.compact()
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["event"] == "snapshot"
+    j.record("intent", cl_ord_id="later", side="buy", price="1", qty="1")
+    j.close()
+    state = Journal.replay(path)
+    assert sorted(state.open_orders) == ["later", "open"]
+    assert state.position_qty == -1
+    # 重新打开时从文件回放出同样的状态
+    reopened = Journal(path)
+    assert sorted(reopened.state.open_orders) == ["later", "open"]
+    reopened.close()
+
+
+def test_second_process_cannot_open_the_same_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    j = Journal(path)
+    with pytest.raises(RuntimeError):
+        Journal(path)
+    j.close()
+    Journal(path).close()
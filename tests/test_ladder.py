@@ -0,0 +1,81 @@
+import pytest
+
+from ladder import build_ladder, ladder_bps, ladder_depths, ladder_in_range, bps_in_range, level_in_range
+from st_ws import StandXBookWS
+
+
+def test_build_ladder_both_sides():
+    long_orders, short_orders = build_ladder(100000.0, 100.0, bps=8, levels=3, step_bps=2)
+    assert [o['price'] for o in long_orders] == ["99920.00", "99900.00", "99880.00"]
+    assert [o['price'] for o in short_orders] == ["100080.00", "100100.00", "100120.00"]
+    assert [o['side'] for o in long_orders] == ["buy"] * 3
+    assert [o['side'] for o in short_orders] == ["sell"] * 3
+    assert [o['level'] for o in long_orders] == [0, 1, 2]
+    assert long_orders[0]['px'] == 99920.0
+    assert long_orders[0]['qty'] == format(100.0 / 99920.0, ".4f")
+
+
+def test_single_level_matches_old_layout():
+    long_orders, short_orders = build_ladder(50000.0, 10.0, bps=10)
+    assert len(long_orders) == len(short_orders) == 1
+    assert long_orders[0]['price'] == "49950.00"
+    assert short_orders[0]['price'] == "50050.00"
+
+
+def test_ladder_bps_is_positive_distance_on_both_sides():
+    long_orders, short_orders = build_ladder(100000.0, 100.0, bps=8, levels=2, step_bps=2)
+    long_bps, short_bps = ladder_bps(100000.0, long_orders, short_orders)
+    assert long_bps == pytest.approx([8, 10])
+    assert short_bps == pytest.approx([8, 10])
+    # 行情向上走 5bps：买单离得更远，卖单更近
+    long_bps, short_bps = ladder_bps(100050.0, long_orders, short_orders)
+    assert long_bps[0] == pytest.approx(12.99, abs=0.01)
+    assert short_bps[0] == pytest.approx(2.99, abs=0.01)
+
+
+@pytest.mark.parametrize("level,bps,expected", [
+    (0, 6.0, False),   # 下沿不含
+    (0, 6.01, True),
+    (0, 9.99, True),
+    (0, 10.0, False),  # 上沿不含
+    (2, 9.0, False),   # 第 2 档区间平移 2 * 2bps -> (10, 14)
+    (2, 10.5, True),
+    (2, 13.99, True),
+    (2, 14.0, False),
+])
+def test_bps_in_range_band_edges(level, bps, expected):
+    assert bps_in_range(level, bps, 6, 10, 2) is expected
+
+
+def test_level_in_range_depth_is_inclusive():
+    assert level_in_range(0, 8, 0.5, 6, 10, 2, 0.5)
+    assert not level_in_range(0, 8, 0.49, 6, 10, 2, 0.5)
+    assert not level_in_range(0, 11, 5.0, 6, 10, 2, 0.5)
+
+
+def test_ladder_in_range_needs_every_level():
+    long_orders, _ = build_ladder(100000.0, 100.0, bps=8, levels=3, step_bps=2)
+    assert ladder_in_range(long_orders, [8, 10, 12], [1, 1, 1], 6, 10, 2, 0.5)
+    assert not ladder_in_range(long_orders, [8, 10, 14.5], [1, 1, 1], 6, 10, 2, 0.5)
+    assert not ladder_in_range(long_orders, [8, 10, 12], [1, 0.1, 1], 6, 10, 2, 0.5)
+    # 被深度过滤掉的档位不在列表里，剩下的按各自 level 判断
+    assert ladder_in_range(long_orders[::2], [8, 12], [1, 1], 6, 10, 2, 0.5)
+
+
+def test_ladder_depths_and_per_level_filter():
+    book_ws = StandXBookWS(lambda book: None)
+    book = {
+        "asks": ((100005.0, 0.2), (100085.0, 0.3), (100101.0, 1.0)),
+        "bids": ((99995.0, 0.2), (99915.0, 0.3), (99899.0, 1.0)),
+    }
+    long_orders, short_orders = build_ladder(100000.0, 100.0, bps=8, levels=3, step_bps=2)
+    long_depths, short_depths = ladder_depths(book_ws, book, long_orders, short_orders)
+    # 买单看价格 >= 挂单价的 bids，卖单看价格 <= 挂单价的 asks
+    assert long_depths == pytest.approx([0.2, 0.5, 1.5])
+    assert short_depths == pytest.approx([0.2, 0.5, 1.5])
+    # beg2 下单前按档位过滤：前面深度不够的档位不挂
+    min_dep = 1.0
+    kept = [o['level'] for o, d in zip(long_orders, long_depths) if d >= min_dep]
+    assert kept == [2]
+    kept = [o['level'] for o, d in zip(short_orders, short_depths) if d >= 0.5]
+    assert kept == [1, 2]
@@ -0,0 +1,78 @@
+import math
+import random
+
+import pytest
+
+from market_stats import MarketStats, RollingSum
+
+
+def _window(values, size):
+    w = values[-size:]
+    return math.fsum(w), math.fsum(v * v for v in w)
+
+
+def test_rolling_sum_matches_window_over_many_laps():
+    rng = random.Random(1)
+    rs = RollingSum(50)
+    values = []
+    for k in range(5000):
+        # 大小悬殊的值，naive 加新减旧会漂移
+        x = rng.gauss(0, 1e-4) + (1e6 if k % 977 == 0 else 0.0)
+        values.append(x)
+        rs.push(x)
+        if k % 50 == 49:
+            s, sq = _window(values, 50)
+            assert rs.sum == pytest.approx(s, rel=1e-12, abs=1e-12)
+            assert rs.sumsq == pytest.approx(sq, rel=1e-12, abs=1e-12)
+    assert rs.n == 50
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 49, 50, 51, 500])
+def test_push_repeat_matches_push(count):
+    a, b = RollingSum(50), RollingSum(50)
+    for k in range(23):
+        a.push(k * 0.5)
+        b.push(k * 0.5)
+    a.push_repeat(2.5, count)
+    for _ in range(count):
+        b.push(2.5)
+    assert a.n == b.n
+    assert a.sum == pytest.approx(b.sum)
+    assert a.sumsq == pytest.approx(b.sumsq)
+    # 之后的 push 也一致（环形位置对齐）
+    for k in range(60):
+        a.push(-k * 0.1)
+        b.push(-k * 0.1)
+        assert a.sum == pytest.approx(b.sum, abs=1e-9)
+
+
+def _book(mid, bid_qty=1.0, ask_qty=1.0):
+    return {"asks": [[mid + 0.5, ask_qty]], "bids": [[mid - 0.5, bid_qty]]}
+
+
+def test_stats_after_feed_gap_longer_than_windows():
+    stats = MarketStats(windows=(1, 5), tick=0.1, levels=5)
+    t = 0.0
+    for k in range(100):
+        stats.on_book(_book(100.0 + k * 0.01), now=t)
+        t += 0.1
+    # 10 分钟没有帧：所有窗口只剩“价格不变”的空桶
+    stats.on_book(_book(100.0, bid_qty=3.0), now=t + 600)
+    stats.on_book(_book(100.0, bid_qty=3.0), now=t + 600.15)
+    state = stats.state
+    assert state.warm == {1: True, 5: True}
+    # 空档补齐的桶全是 0 收益、失衡 0；只有空档后第一个桶带着跨空档的价格变化和新的失衡
+    ret = math.log(100.0 / 100.99) * 10000
+    for w, size in ((1, 10), (5, 50)):
+        assert state.vol_bps[w] == pytest.approx(abs(ret))
+        assert state.drift_bps[w] == pytest.approx(ret)
+        assert state.imbalance_avg[w] == pytest.approx(0.5 / size)
+
+
+def test_stats_warm_after_one_window():
+    stats = MarketStats(windows=(1,), tick=0.1, levels=5)
+    for k in range(12):
+        stats.on_book(_book(100.0), now=k * 0.1 + 0.05)
+    assert stats.state.warm == {1: True}
+    assert stats.state.vol_bps[1] == 0.0
+    assert stats.state.depth_ratio[1] == pytest.approx(1.0)
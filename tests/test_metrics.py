@@ -0,0 +1,39 @@
+import threading
+
+from metrics import Counter, Registry
+
+
+def _run_threads(target, n):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_counter_sums_across_threads():
+    c = Counter("c", "test")
+    c.inc()
+    _run_threads(lambda: c.inc(2), 10)
+    assert c.value() == 21
+
+
+def test_counter_retires_cells_of_dead_threads():
+    c = Counter("c", "test")
+    for _ in range(10):
+        _run_threads(c.inc, 100)
+    assert c.value() == 1000
+    assert len(c._cells) == 0
+    c.inc(5)
+    assert c.value() == 1005
+    assert len(c._cells) == 1
+
+
+def test_labeled_counter_renders_children():
+    registry = Registry()
+    c = registry.counter("orders_total", "orders", ("side",))
+    c.labels(side="buy").inc()
+    _run_threads(lambda: c.labels(side="sell").inc(), 3)
+    text = registry.render()
+    assert 'orders_total{side="buy"} 1' in text
+    assert 'orders_total{side="sell"} 3' in text
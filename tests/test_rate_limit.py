@@ -0,0 +1,95 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limit import RequestScheduler, TokenBucket, parse_reset, parse_retry_after
+
+
+def response(status_code, **headers):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Thu, 01 Jan 2026 00:00:10 GMT", now_epoch=1767225600) == pytest.approx(10)
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_parse_reset_accepts_seconds_and_epochs():
+    now = 1767225600
+    assert parse_reset("3", now_epoch=now) == 3
+    assert parse_reset(str(now + 4), now_epoch=now) == pytest.approx(4)
+    assert parse_reset(str((now + 5) * 1000), now_epoch=now) == pytest.approx(5)
+    assert parse_reset("x", now_epoch=now) is None
+
+
+def test_bucket_penalize_and_recover():
+    bucket = TokenBucket(8, 8, min_rate=1)
+    now = time.monotonic()
+    bucket.penalize(now)
+    assert bucket.rate == 4
+    assert bucket.wait_time(now) > 0
+    for _ in range(5):
+        bucket.penalize(now)
+    assert bucket.rate == 1
+    for _ in range(100):
+        bucket.recover()
+    assert bucket.rate == 8
+
+
+def test_429_halves_rates_and_honours_retry_after():
+    scheduler = RequestScheduler(limits={"query": (10, 10)}, global_limit=(100, 100))
+    scheduler.record("query", 0.0, 0.01, response(429, **{"Retry-After": "0.2"}))
+    assert scheduler._buckets["query"].rate == 5
+    assert scheduler._global.rate == 50
+    assert scheduler.stats["query"]["rate_limited"] == 1
+    waited = scheduler.acquire("query")
+    assert waited >= 0.18
+    # 之后的 2xx 加性恢复
+    scheduler.record("query", 0.0, 0.01, response(200))
+    assert scheduler._buckets["query"].rate > 5
+
+
+def test_rate_limit_remaining_zero_pauses_until_reset():
+    scheduler = RequestScheduler(global_limit=(100, 100))
+    scheduler.record("create", 0.0, 0.01, response(200, **{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0.15"}))
+    assert scheduler._buckets["create"].rate == 20
+    assert scheduler.acquire("create") >= 0.13
+    assert scheduler.acquire("cancel") < 0.05
+
+
+def test_higher_priority_wins_the_global_bucket():
+    scheduler = RequestScheduler(global_limit=(10, 1))
+    scheduler.acquire("query")  # 全局桶清空，下一个令牌 0.1s 后才有
+    order = []
+
+    def worker(klass, delay):
+        time.sleep(delay)
+        scheduler.acquire(klass)
+        order.append(klass)
+
+    threads = [
+        threading.Thread(target=worker, args=("query", 0.0)),
+        threading.Thread(target=worker, args=("cancel", 0.02)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+    assert order == ["cancel", "query"]
+
+
+def test_try_acquire_never_waits():
+    scheduler = RequestScheduler(limits={"query": (10, 2)}, global_limit=(100, 100))
+    assert scheduler.try_acquire("query")
+    assert scheduler.try_acquire("query")
+    t0 = time.monotonic()
+    assert not scheduler.try_acquire("query")
+    assert time.monotonic() - t0 < 0.01
+    scheduler.record("cancel", 0.0, 0.01, response(429, **{"Retry-After": "1"}))
+    # 全局桶被 429 暂停，其他类也拿不到
+    assert not scheduler.try_acquire("create")
@@ -0,0 +1,53 @@
+import pytest
+
+import common
+from journal import Journal
+
+
+class FakeApi:
+    def __init__(self, open_orders, positions):
+        self.open_orders = open_orders
+        self.positions = positions
+        self.calls = []
+
+    def cancel_orders(self, auth, cl_ord_ids):
+        self.calls.append(("cancel_orders", list(cl_ord_ids)))
+        raise RuntimeError("400 unknown cl_ord_id")
+
+    def query_orders(self, auth):
+        self.calls.append(("query_orders",))
+        return {"result": [{"cl_ord_id": i} for i in self.open_orders]}
+
+    def query_positions(self, auth):
+        self.calls.append(("query_positions",))
+        return [{"qty": q} for q in self.positions]
+
+
+@pytest.fixture
+def journaled(tmp_path, monkeypatch):
+    j = Journal(str(tmp_path / "journal.jsonl"))
+    j.record("intent", cl_ord_id="stale", side="buy", price="100.00", qty="0.1")
+    j.record("ack", cl_ord_id="stale")
+    monkeypatch.setattr(common, "journal", j)
+    yield j
+    j.close()
+
+
+def test_failed_journaled_cancel_still_sweeps(journaled, monkeypatch):
+    api = FakeApi(open_orders=["live"], positions=["0.1"])
+    cleaned = []
+    monkeypatch.setattr(common, "api", api)
+    monkeypatch.setattr(common, "clean_orders", lambda auth: cleaned.append("orders"))
+    monkeypatch.setattr(common, "clean_positions", lambda auth: cleaned.append("positions"))
+    common.recover({})
+    assert api.calls == [("cancel_orders", ["stale"]), ("query_orders",), ("query_positions",)]
+    assert cleaned == ["orders", "positions"]
+
+
+def test_failed_journaled_cancel_on_clean_account(journaled, monkeypatch):
+    api = FakeApi(open_orders=[], positions=["0"])
+    monkeypatch.setattr(common, "api", api)
+    common.recover({})
+    assert [c[0] for c in api.calls] == ["cancel_orders", "query_orders", "query_positions"]
+    assert journaled.state.open_orders == {}
+    assert journaled.state.position_qty == 0
@@ -0,0 +1,114 @@
+import json
+import threading
+
+import pytest
+
+from st_ws import StandXBookWS
+
+
+def _frame(asks, bids, sep=", ", extra=None):
+    data = {"symbol": "BTC-USD", "asks": asks, "bids": bids}
+    if extra:
+        data.update(extra)
+    return json.dumps({"channel": "depth_book", "data": data}, separators=(sep, ": "))
+
+
+def _full(raw, levels):
+    data = json.loads(raw)["data"]
+    asks = sorted((float(p), float(q)) for p, q in data["asks"])[:levels]
+    bids = sorted(((float(p), float(q)) for p, q in data["bids"]), reverse=True)[:levels]
+    return {"asks": tuple(asks), "bids": tuple(bids)}
+
+
+def _sorted_levels(n, start, step):
+    return [[f"{start + i * step:.2f}", f"{0.1 * (i + 1):.3f}"] for i in range(n)]
+
+
+def _warm(ws, raw):
+    # 第一帧走完整解码，确认推送有序之后才走前缀解码
+    ws.decode(raw)
+    assert ws._presorted
+
+
+@pytest.mark.parametrize("n_levels", [1, 3, 5, 50])
+def test_prefix_matches_full_decode(n_levels):
+    ws = StandXBookWS(lambda book: None, levels=5)
+    raw = _frame(_sorted_levels(n_levels, 100.5, 0.5), _sorted_levels(n_levels, 99.5, -0.5))
+    _warm(ws, raw)
+    assert ws._decode_prefix(raw) is not None
+    assert dict(ws.decode(raw)) == _full(raw, 5)
+
+
+def test_prefix_with_bids_first_and_short_asks():
+    ws = StandXBookWS(lambda book: None, levels=5)
+    data = {"bids": _sorted_levels(20, 99.5, -0.5), "asks": _sorted_levels(2, 100.5, 0.5)}
+    raw = json.dumps({"channel": "depth_book", "data": data})
+    _warm(ws, raw)
+    assert dict(ws.decode(raw)) == _full(raw, 5)
+
+
+@pytest.mark.parametrize("asks,bids", [
+    # 数字而不是字符串、指数、负零、多余空白
+    ([[100.5, 1], [101, 2e-3]], [[99.5, 0.5], [99, 1e1]]),
+    ([["1.005e2", "0.10"], ["101", "-0"]], [["99.50", "1E-3"], ["99", "2"]]),
+])
+def test_prefix_unusual_number_formats(asks, bids):
+    ws = StandXBookWS(lambda book: None, levels=2)
+    raw = _frame(asks, bids).replace("[", "[ ").replace("]", " ]")
+    _warm(ws, raw)
+    assert ws._decode_prefix(raw) is not None
+    assert dict(ws.decode(raw)) == _full(raw, 2)
+
+
+def test_escaped_unicode_in_raw_text():
+    ws = StandXBookWS(lambda book: None, levels=2)
+    raw = '{"channel": "depth_book", "data": {"asks": [["\\u0031\\u0030\\u0031", "1"], ["102", "1"]], "bids": [["99", "1"]]}}'
+    _warm(ws, raw)
+    assert ws.decode(raw)["asks"] == ((101.0, 1.0), (102.0, 1.0))
+
+
+def test_unsorted_feed_falls_back_to_full_decode():
+    ws = StandXBookWS(lambda book: None, levels=3, verify_every=2)
+    sorted_raw = _frame(_sorted_levels(10, 100.5, 0.5), _sorted_levels(10, 99.5, -0.5))
+    _warm(ws, sorted_raw)
+    asks = _sorted_levels(10, 100.5, 0.5)
+    asks.reverse()
+    unsorted_raw = _frame(asks, _sorted_levels(10, 99.5, -0.5))
+    # 前缀乱序：当帧就退回完整解码，结果仍然正确
+    assert dict(ws.decode(unsorted_raw)) == _full(unsorted_raw, 3)
+    assert not ws._presorted
+    assert dict(ws.decode(sorted_raw)) == _full(sorted_raw, 3)
+    assert ws._presorted
+
+
+def test_empty_side_is_not_a_book():
+    ws = StandXBookWS(lambda book: None, levels=5)
+    raw = _frame(_sorted_levels(3, 100.5, 0.5), _sorted_levels(3, 99.5, -0.5))
+    _warm(ws, raw)
+    assert ws.decode(_frame([], _sorted_levels(3, 99.5, -0.5))) is None
+
+
+def test_conflation_decodes_only_latest_frame():
+    books = []
+    got = threading.Event()
+
+    def setter(book):
+        books.append(book)
+        got.set()
+
+    ws = StandXBookWS(setter, levels=1)
+    frames = [_frame([[f"{100 + i}", "1"]], [["99", "1"]]) for i in range(5)]
+    for raw in frames:
+        ws._on_message(None, raw)
+    ws._on_message(None, '{"channel": "other"}')
+    assert ws.stats() == {"received": 5, "decoded": 0, "dropped": 4}
+    t = threading.Thread(target=ws._decode_loop, daemon=True)
+    t.start()
+    try:
+        assert got.wait(2)
+    finally:
+        ws._stop = True
+        ws._frame_event.set()
+        t.join(2)
+    assert [b["asks"] for b in books] == [((104.0, 1.0),)]
+    assert ws.stats() == {"received": 5, "decoded": 1, "dropped": 4}
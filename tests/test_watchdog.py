@@ -0,0 +1,70 @@
+import time
+import threading
+from types import SimpleNamespace
+
+from nacl.signing import SigningKey
+
+import http_conn
+import supervisor
+from supervisor import Supervisor
+from watchdog import Watchdog
+
+
+class FakeSession:
+    def __init__(self, status):
+        self.status = status
+        self.posts = []
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        self.posts.append(data)
+        return SimpleNamespace(status_code=self.status, text="", headers={})
+
+
+def _watchdog(status, **kw):
+    stale_book = SimpleNamespace(get=lambda: SimpleNamespace(ts=time.time() - 60))
+    w = Watchdog({"access_token": "t", "signing_key": SigningKey.generate()}, stale_book, check_ms=5, **kw)
+    w.session = FakeSession(status)
+    return w
+
+
+def _run_for(w, seconds):
+    t = threading.Thread(target=w._run, daemon=True)
+    t.start()
+    time.sleep(seconds)
+    w.stop()
+    t.join(1)
+
+
+def test_own_dns_cache_and_handshake_stats():
+    w = Watchdog({}, None)
+    pool_cls = w.session.get_adapter("https://example.com")._pool_cls
+    assert pool_cls.ConnectionCls.dns_cache is w.dns
+    assert w.dns is not http_conn.dns_cache
+    assert pool_cls.ConnectionCls.handshake_latency is not http_conn.handshake_latency
+
+
+def test_cancel_retries_back_off():
+    w = _watchdog(503, retry_base_ms=50, retry_max_ms=200)
+    w.set_orders(["a"])
+    _run_for(w, 0.6)
+    # 50 + 100 + 200 + 200ms：大约 4~5 次，而不是每 5ms 一次
+    assert 3 <= len(w.session.posts) <= 6
+    assert w._orders == ("a",)
+
+
+def test_fatal_reject_drops_orders():
+    w = _watchdog(400)
+    w.set_orders(["a", "b"])
+    _run_for(w, 0.2)
+    assert len(w.session.posts) == 1
+    assert w._orders == ()
+    assert not w.tripped
+
+
+def test_supervisor_cleanup_clears_watchdog_orders(monkeypatch):
+    monkeypatch.setattr(supervisor, "recover", lambda auth: None)
+    w = Watchdog({}, None)
+    w.set_orders(["old"])
+    s = Supervisor({"access_token": "t"}, lambda book: None, None, watchdog=w)
+    s.cleanup()
+    assert w._orders == ()
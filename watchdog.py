@@ -0,0 +1,129 @@
+import json
+import time
+from urllib.parse import urlsplit
+import threading
+import logging
+
+import st_http
+import http_conn
+from rate_limit import parse_retry_after
+from latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class Watchdog:
+    """
+    独立线程盯着策略主循环：心跳超过 heartbeat_ms 或盘口超过 book_age_ms 没更新时，
+    直接用自己的 HTTP 连接撤掉已知挂单。
+
+    不走 request_with_retry / scheduler / 下单线程池，不和策略共享任何锁或连接：
+    连接池、DNS 缓存和握手耗时统计都是自己的实例，DNS 缓存只在没有触发时顺带刷新。
+    heartbeat() / set_orders() 都只是一次属性赋值。
+
+    撤单失败时对同一批订单按 retry_base_ms 起指数退避（上限 retry_max_ms，429 时至少等 Retry-After）；
+    收到不可重试的 4xx（订单已成交/已撤、参数错误等）就放弃这批 cl_ord_id，不再重发。
+    """
+
+    def __init__(self, auth, book_holder, heartbeat_ms=1500, book_age_ms=2000, check_ms=50, on_cancel=None,
+                 retry_base_ms=100, retry_max_ms=2000):
+        self.auth = auth
+        self.book_holder = book_holder
+        self.heartbeat_ms = float(heartbeat_ms)
+        self.book_age_ms = float(book_age_ms)
+        self.check_s = check_ms / 1000
+        self.retry_base_s = retry_base_ms / 1000
+        self.retry_max_s = retry_max_ms / 1000
+        self.on_cancel = on_cancel
+        self.dns = http_conn.DnsCache()
+        self.session = http_conn.new_session(pool_maxsize=2, dns=self.dns, handshakes=LatencyTracker(64))
+        self.tripped = False
+        self.trips = 0
+        self._heartbeat = time.monotonic()
+        self._orders = ()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        self.dns.prefetch(urlsplit(st_http.BASE_URL).hostname)
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"watchdog started: heartbeat={self.heartbeat_ms}ms book_age={self.book_age_ms}ms")
+        return self._thread
+
+    def stop(self):
+        self._stop = True
+
+    def heartbeat(self):
+        self._heartbeat = time.monotonic()
+
+    def set_orders(self, cl_ord_ids):
+        self._orders = tuple(cl_ord_ids)
+
+    def _run(self):
+        failed_orders = None
+        failures = 0
+        retry_at = 0.0
+        while not self._stop:
+            time.sleep(self.check_s)
+            orders = self._orders
+            if not orders:
+                self.dns.refresh()
+                continue
+            hb_ms = (time.monotonic() - self._heartbeat) * 1000
+            book_ms = (time.time() - self.book_holder.get().ts) * 1000
+            if hb_ms > self.heartbeat_ms:
+                reason = f"heartbeat {hb_ms:.0f}ms"
+            elif book_ms > self.book_age_ms:
+                reason = f"book age {book_ms:.0f}ms"
+            else:
+                self.dns.refresh()
+                continue
+            if orders != failed_orders:
+                failed_orders = None
+                failures = 0
+            elif time.monotonic() < retry_at:
+                continue
+            try:
+                resp = self._cancel(orders)
+                status = resp.status_code
+                error = f"{status} {resp.text}"
+            except Exception as e:
+                resp = status = None
+                error = repr(e)
+            if status != 200:
+                kind = st_http.classify_status(status) if status is not None else "retry"
+                if kind == "fatal":
+                    # 重试也不会成功：这批订单大概率已经成交或撤掉，交给策略按推送/REST 处理
+                    logger.info(f"watchdog cancel rejected ({reason}): {error}, giving up on {list(orders)}")
+                    if self._orders == orders:
+                        self._orders = ()
+                    failed_orders = None
+                    continue
+                failed_orders = orders
+                failures += 1
+                delay = min(self.retry_max_s, self.retry_base_s * 2 ** (failures - 1))
+                if kind == "rate_limited":
+                    retry_after = parse_retry_after((resp.headers or {}).get("Retry-After"))
+                    if retry_after is not None:
+                        delay = max(delay, retry_after)
+                retry_at = time.monotonic() + delay
+                logger.info(f"watchdog cancel failed ({reason}): {error}, retry #{failures} in {delay:.2f}s")
+                continue
+            failed_orders = None
+            logger.info(f"watchdog canceled {len(orders)} orders ({reason}): {list(orders)}")
+            if self._orders == orders:
+                self._orders = ()
+            self.trips += 1
+            self.tripped = True
+            if self.on_cancel is not None:
+                self.on_cancel(list(orders))
+
+    def _cancel(self, cl_ord_ids):
+        payload_str = json.dumps({"cl_ord_id_list": list(cl_ord_ids)}, separators=(",", ":"))
+        return self.session.post(
+            f"{st_http.BASE_URL}/api/cancel_orders",
+            headers=st_http.get_headers(self.auth, payload_str),
+            data=payload_str,
+            timeout=(0.5, 1),
+        )